@@ -0,0 +1,37 @@
+import importlib
+
+# Keboola FinOps pricing and usage core. The Streamlit UI (streamlit_app.py) is a thin layer on top.
+# Nothing is imported up front: each name loads its module on first use, so `import keboola_finops`
+# costs no NumPy / pandas and a pricing job only pays for the modules it touches
+# (python -m keboola_finops.import_budget).
+_EXPORTS = {
+    "money": ("MICROS", "format_money", "format_quantity", "from_micros", "round_micros", "to_micros", "total_micros"),
+    "tiers": ("GRADUATED", "WHOLE_VOLUME", "TierTable", "tier_table_of"),
+    "pricing_rules": ("FIXED", "PREMIUM", "TIERED", "PricingRuleError", "RuleTable", "load_rules", "rules"),
+    "cost_engine": (
+        "calculate_cost", "compute_cost_micros", "compute_costs", "explain_cost", "get_price", "line_cost_micros",
+    ),
+    "scenarios": ("cheapest_purchase", "forecast_costs", "sweep", "tier_breakpoints"),
+    "monte_carlo": ("simulate",),
+    "limit_optimizer": ("optimize_limit", "optimize_limits"),
+    "usage_loader": ("iter_usage_chunks", "latest_month_start", "load_daily_usage", "load_usage"),
+    "rollup_store": ("RollupStore",),
+    "attribution_cube": ("AttributionCube",),
+    "breach_detector": ("BreachDetector", "replay_export"),
+    "usage_fetcher": ("UsageFetcher",),
+}
+_MODULES = {name: module for module, names in _EXPORTS.items() for name in names}
+
+__all__ = sorted(_MODULES)
+
+
+def __getattr__(name):
+    if name not in _MODULES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{_MODULES[name]}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted([*globals(), *__all__])
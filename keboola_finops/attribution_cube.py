@@ -0,0 +1,205 @@
+import argparse
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+from .rollup_store import RollupStore, bucket_of, bucket_range
+from .usage_loader import (
+    COMPONENT_COLUMN, CONFIGURATION_COLUMN, DATE_COLUMN, DEFAULT_CHUNKSIZE, METRIC_COLUMN, PROJECT_COLUMN,
+    USER_COLUMN, VALUE_COLUMN, is_level_metric, iter_usage_chunks,
+)
+
+# Attribution hierarchy, coarsest first. Exports without a column attribute all usage to "".
+DIMENSIONS = (PROJECT_COLUMN, COMPONENT_COLUMN, CONFIGURATION_COLUMN, USER_COLUMN)
+
+# Dimension value of a rolled-up cell ("all projects", "all components", ...)
+ALL = "*"
+
+# Chunk totals held before they are folded into the running leaf totals
+FOLD_CHUNKS = 8
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS attribution_daily (
+    metric TEXT NOT NULL,
+    day TEXT NOT NULL,
+    project_id TEXT NOT NULL,
+    component TEXT NOT NULL,
+    configuration_id TEXT NOT NULL,
+    user TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (metric, day, project_id, component, configuration_id, user)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS attribution_cube (
+    metric TEXT NOT NULL,
+    month TEXT NOT NULL,
+    cuboid INTEGER NOT NULL,
+    project_id TEXT NOT NULL,
+    component TEXT NOT NULL,
+    configuration_id TEXT NOT NULL,
+    user TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (metric, month, cuboid, project_id, component, configuration_id, user)
+) WITHOUT ROWID;
+"""
+
+
+# Cuboid id of a set of grouped dimensions: one bit per dimension of DIMENSIONS
+def cuboid_of(dimensions):
+    return sum(1 << DIMENSIONS.index(dimension) for dimension in dimensions)
+
+
+# Every combination of grouped dimensions, from the grand total to the full breakdown
+def cuboids():
+    return [grouped for size in range(len(DIMENSIONS) + 1) for grouped in combinations(DIMENSIONS, size)]
+
+
+# Stream an export into per-day totals of the flow metrics per (project, component,
+# configuration, user). Levels and project counts cannot be split by component and are skipped.
+# Chunk totals are folded into the running totals every FOLD_CHUNKS chunks, so memory is bounded
+# by the number of distinct leaf cells (plus a few chunks' worth), not by the length of the file.
+def load_daily_attribution(path, chunksize=DEFAULT_CHUNKSIZE, column_map=None):
+    keys = [DATE_COLUMN, METRIC_COLUMN, *DIMENSIONS]
+    levels = list(range(len(keys)))
+    totals = None
+    partials = []
+    for chunk in iter_usage_chunks(path, chunksize=chunksize, column_map=column_map):
+        chunk = chunk.dropna(subset=[DATE_COLUMN])
+        flows = [metric for metric in chunk[METRIC_COLUMN].dropna().unique() if not is_level_metric(metric)]
+        chunk = chunk[chunk[METRIC_COLUMN].isin(flows)]
+        if chunk.empty:
+            continue
+        leaves = pd.DataFrame({DATE_COLUMN: chunk[DATE_COLUMN].dt.normalize(), METRIC_COLUMN: chunk[METRIC_COLUMN].astype(str)})
+        for dimension in DIMENSIONS:
+            leaves[dimension] = chunk[dimension].astype(object).fillna("").astype(str) if dimension in chunk else ""
+        leaves[VALUE_COLUMN] = chunk[VALUE_COLUMN].to_numpy()
+        partials.append(leaves.groupby(keys, sort=False)[VALUE_COLUMN].sum())
+        if len(partials) >= FOLD_CHUNKS:
+            totals = _fold(totals, partials, levels)
+            partials = []
+    if partials:
+        totals = _fold(totals, partials, levels)
+    if totals is None:
+        return pd.DataFrame(columns=[*keys, VALUE_COLUMN])
+    return totals.sort_index().reset_index()
+
+
+# Running leaf totals plus the pending chunk totals, regrouped into one total per cell
+def _fold(totals, partials, levels):
+    pending = partials if totals is None else [totals, *partials]
+    return pd.concat(pending).groupby(level=levels, sort=False).sum()
+
+
+# Usage of flow metrics (PPU, Snowflake credits) attributed to projects, components,
+# configurations and users, with every group-by rollup of the hierarchy precomputed per month.
+# Lives next to the rollups in the same SQLite store. Appending days only rebuilds the months
+# they fall into; a drill-down step reads one cuboid by its primary key.
+class AttributionCube:
+    def __init__(self, store):
+        self.store = store
+        self.connection = store.connection
+        self.connection.executescript(SCHEMA)
+
+    # Append daily leaf totals (date / metric / dimensions / value). Days already in the cube
+    # are replaced, so re-ingesting the same export is idempotent.
+    def append(self, leaves):
+        if leaves.empty:
+            return
+        days = pd.to_datetime(leaves[DATE_COLUMN]).dt.date
+        metrics = leaves[METRIC_COLUMN].astype(str)
+        rows = zip(
+            metrics, (day.isoformat() for day in days), *(leaves[d].astype(str) for d in DIMENSIONS),
+            leaves[VALUE_COLUMN].astype(float),
+        )
+        affected = {(metric, bucket_of(day, "month")) for metric, day in set(zip(metrics, days))}
+
+        with self.connection:
+            # Replace whole days: a day re-ingested without some of its cells loses them
+            self.connection.executemany(
+                "DELETE FROM attribution_daily WHERE metric = ? AND day = ?",
+                sorted({(metric, day.isoformat()) for metric, day in zip(metrics, days)}),
+            )
+            self.connection.executemany(
+                f"INSERT INTO attribution_daily (metric, day, {', '.join(DIMENSIONS)}, value) "
+                f"VALUES (?, ?, {', '.join('?' * len(DIMENSIONS))}, ?)",
+                rows,
+            )
+            for metric, month in sorted(affected):
+                self._refresh(metric, month)
+
+    # Rebuild every cuboid of one metric and month from the daily leaves
+    def _refresh(self, metric, month):
+        start, end = bucket_range(month, "month")
+        self.connection.execute("DELETE FROM attribution_cube WHERE metric = ? AND month = ?", (metric, month))
+        for grouped in cuboids():
+            selected = ", ".join(d if d in grouped else f"'{ALL}'" for d in DIMENSIONS)
+            group_by = f" GROUP BY {', '.join(grouped)}" if grouped else ""
+            self.connection.execute(
+                f"INSERT INTO attribution_cube (metric, month, cuboid, {', '.join(DIMENSIONS)}, value) "
+                f"SELECT ?, ?, ?, {selected}, SUM(value) FROM attribution_daily "
+                f"WHERE metric = ? AND day >= ? AND day < ?{group_by}",
+                (metric, month, cuboid_of(grouped), metric, start, end),
+            )
+
+    # Stream an export file into the cube
+    def ingest(self, path, **kwargs):
+        self.append(load_daily_attribution(path, **kwargs))
+
+    def metrics(self):
+        rows = self.connection.execute("SELECT DISTINCT metric FROM attribution_cube ORDER BY metric")
+        return [metric for (metric,) in rows]
+
+    def months(self, metric):
+        rows = self.connection.execute(
+            "SELECT DISTINCT month FROM attribution_cube WHERE metric = ? ORDER BY month", (metric,)
+        )
+        return [month for (month,) in rows]
+
+    # Usage of one cell: `filters` fixes some dimensions, the others are summed over
+    def total(self, metric, month, filters=None):
+        filters = filters or {}
+        cell = [filters.get(dimension, ALL) for dimension in DIMENSIONS]
+        row = self.connection.execute(
+            f"SELECT value FROM attribution_cube WHERE metric = ? AND month = ? AND cuboid = ? AND "
+            f"{' AND '.join(f'{d} = ?' for d in DIMENSIONS)}",
+            (metric, month, cuboid_of(filters), *cell),
+        ).fetchone()
+        return row[0] if row else 0.0
+
+    # Drill-down step: usage of one slice (`filters`) broken down by dimension `by`, largest first
+    def breakdown(self, metric, month, by, filters=None):
+        filters = {dimension: value for dimension, value in (filters or {}).items() if dimension != by}
+        conditions = "".join(f" AND {dimension} = ?" for dimension in filters)
+        rows = self.connection.execute(
+            f"SELECT {by}, value FROM attribution_cube WHERE metric = ? AND month = ? AND cuboid = ?{conditions} "
+            f"ORDER BY value DESC",
+            (metric, month, cuboid_of([*filters, by]), *filters.values()),
+        )
+        return pd.DataFrame(rows.fetchall(), columns=[by, VALUE_COLUMN])
+
+
+# Split a metric's cost (micros) over usage shares. Each row gets its share rounded to the micro;
+# the rows of a complete breakdown add up to the cost within one micro per row.
+def attribute_cost(values, metric_usage, metric_cost_micros):
+    values = np.asarray(values, dtype=float)
+    if not metric_usage:
+        return np.zeros(len(values), dtype=np.int64)
+    return np.rint(values / metric_usage * metric_cost_micros).astype(np.int64)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Append Keboola usage exports to the cost attribution cube.")
+    parser.add_argument("exports", nargs="+", help="CSV, Parquet or history usage exports")
+    parser.add_argument("--db", required=True, help="SQLite rollup store holding the cube")
+    args = parser.parse_args()
+
+    store = RollupStore(args.db)
+    cube = AttributionCube(store)
+    for path in args.exports:
+        cube.ingest(path)
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import pandas as pd
+
+from .cost_engine import compute_cost_micros, default_unit_costs
+from .money import from_micros
+
+# Columns of the contracts input - one row per contract and metric
+CONTRACT_COLUMN = "contract_id"
+METRIC_COLUMN = "metric"
+SPEND_COLUMN = "spend"
+LIMIT_COLUMN = "limit"
+UNIT_COST_COLUMN = "unit_cost"  # optional, defaults to the current discounted prices
+
+OUTPUT_FORMATS = ("parquet", "csv")
+
+
+def read_contracts(path):
+    path = Path(path)
+    if path.suffix.lower() in (".parquet", ".pq"):
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+
+# Split contracts into shards by a hash of the contract id, so each contract lands in exactly one shard
+def shard_contracts(contracts, shards):
+    shard_ids = pd.util.hash_array(contracts[CONTRACT_COLUMN].astype(str).to_numpy()) % shards
+    return [contracts[shard_ids == shard] for shard in range(shards) if (shard_ids == shard).any()]
+
+
+# Tab 3 "Celkové náklady" for every row of a set of contracts
+def price_contracts(contracts):
+    if UNIT_COST_COLUMN in contracts:
+        unit_cost = contracts[UNIT_COST_COLUMN].fillna(contracts[METRIC_COLUMN].map(default_unit_costs)).fillna(0)
+    else:
+        unit_cost = contracts[METRIC_COLUMN].map(default_unit_costs).fillna(0)
+
+    in_limit_cost, over_limit_cost, total = compute_cost_micros(
+        contracts[METRIC_COLUMN].to_numpy(),
+        contracts[SPEND_COLUMN].to_numpy(),
+        contracts[LIMIT_COLUMN].to_numpy(),
+        unit_cost.to_numpy(),
+    )
+    return contracts.assign(
+        unit_cost=unit_cost.to_numpy(),
+        in_limit_cost=from_micros(in_limit_cost),
+        over_limit_cost=from_micros(over_limit_cost),
+        total_cost=from_micros(total),
+        total_cost_micros=total,
+    )
+
+
+def write_frame(frame, path, output_format):
+    if output_format == "parquet":
+        frame.to_parquet(path, index=False)
+    else:
+        frame.to_csv(path, index=False)
+
+
+# Worker: price one shard and write its detail and per-contract totals files
+def run_shard(shard_index, contracts, output_dir, output_format):
+    started = time.perf_counter()
+    priced = price_contracts(contracts)
+    # Totals are summed in integer micro-units, so they are exact at any number of rows
+    totals = priced.groupby(CONTRACT_COLUMN, sort=False)["total_cost_micros"].sum().reset_index()
+    totals.insert(1, "total_cost", from_micros(totals["total_cost_micros"].to_numpy()))
+
+    output_dir = Path(output_dir)
+    write_frame(priced, output_dir / f"costs-part-{shard_index:05d}.{output_format}", output_format)
+    write_frame(totals, output_dir / f"totals-part-{shard_index:05d}.{output_format}", output_format)
+    return shard_index, len(priced), len(totals), time.perf_counter() - started
+
+
+def run(input_path, output_dir, workers=None, shards=None, output_format="parquet", log=sys.stderr):
+    workers = workers or os.cpu_count() or 1
+    shards = shards or workers * 4
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    started = time.perf_counter()
+    contracts = read_contracts(input_path)
+    total_rows = 0
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(run_shard, shard_index, shard, output_dir, output_format)
+            for shard_index, shard in enumerate(shard_contracts(contracts, shards))
+        ]
+        for future in as_completed(futures):
+            shard_index, rows, contract_count, seconds = future.result()
+            total_rows += rows
+            print(
+                f"shard {shard_index:5d}: {contract_count:,} contracts, {rows:,} rows "
+                f"in {seconds:.3f}s ({rows / max(seconds, 1e-9):,.0f} rows/s)",
+                file=log,
+            )
+
+    elapsed = time.perf_counter() - started
+    print(f"priced {total_rows:,} rows in {elapsed:.3f}s ({total_rows / max(elapsed, 1e-9):,.0f} rows/s)", file=log)
+    return total_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Price customer contracts outside Streamlit.")
+    parser.add_argument("input", help="CSV or Parquet with contract_id, metric, spend, limit[, unit_cost]")
+    parser.add_argument("--output-dir", required=True, help="directory for the costs-part/totals-part files")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--shards", type=int, default=None, help="number of shards (default: 4 per worker)")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="parquet", help="output file format")
+    args = parser.parse_args()
+
+    run(args.input, args.output_dir, workers=args.workers, shards=args.shards, output_format=args.format)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .cost_engine import calculate_cost, calculate_cost_with_tiers, compute_costs, default_unit_costs, get_price
+from .pricing_rules import rules
+from .rollup_store import extrapolate_spend, period_limits
+from .scenarios import forecast_costs
+from .tiers import GRADUATED
+
+DEFAULT_BASELINE = Path(__file__).with_name("benchmark_baseline.json")
+DEFAULT_SIZES = (1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+DEFAULT_THRESHOLD = 0.2  # fail when throughput drops / peak memory grows by more than 20 %
+
+# Cases calling a scalar function once per row stop at this size - 1e7 Python calls take minutes
+SCALAR_MAX_ROWS = 100_000
+
+# Peak memory differences below this are noise (interpreter and allocator overhead)
+MEMORY_NOISE_MB = 1.0
+
+# A case is repeated until its runs add up to this long, the best run counts
+MIN_CASE_SECONDS = 1.0
+
+
+# Synthetic usage rows over the configured metrics, with spend around the limit
+def synthetic_usage(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    metrics = np.array(rules.metrics, dtype=object)
+    limit = rng.integers(1, 30000, rows)
+    return pd.DataFrame({
+        "Metric": metrics[rng.integers(0, len(metrics), rows)],
+        "Current Spend": (limit * rng.uniform(0, 2, rows)).astype(np.int64),
+        "Limit": limit,
+    })
+
+
+def _unit_costs(usage):
+    return usage["Metric"].map(default_unit_costs).fillna(0).to_numpy()
+
+
+# Each case takes the usage frame and returns the function to time
+def bench_get_price(usage):
+    pricing_table = rules.tier_list[rules.tier_names.index("ppu")]
+    volumes = usage["Current Spend"].to_numpy()
+    return lambda: get_price(volumes, pricing_table)
+
+
+def bench_calculate_cost_with_tiers(usage):
+    pricing_table = rules.pricing_tables["ppu"]
+    rows = list(zip(usage["Current Spend"].tolist(), usage["Limit"].tolist()))
+    return lambda: [calculate_cost_with_tiers(spend, limit, pricing_table) for spend, limit in rows]
+
+
+def bench_calculate_cost(usage):
+    rows = list(zip(usage["Metric"], usage["Current Spend"].tolist(), usage["Limit"].tolist(), _unit_costs(usage)))
+    return lambda: [calculate_cost(*row) for row in rows]
+
+
+def bench_compute_costs(usage):
+    metrics, spend, limit = usage["Metric"].to_numpy(), usage["Current Spend"].to_numpy(), usage["Limit"].to_numpy()
+    unit_cost = _unit_costs(usage)
+    return lambda: compute_costs(metrics, spend, limit, unit_cost)
+
+
+# Tab 1 "Roční" view without history: yearly limits and extrapolated spend
+def bench_period_transform(usage):
+    metrics, spend, limit = usage["Metric"].to_numpy(), usage["Current Spend"].to_numpy(), usage["Limit"].to_numpy()
+    return lambda: (period_limits(metrics, limit, "year"), extrapolate_spend(metrics, spend, "year"))
+
+
+# Tab 4 planned cost loop, one metric at a time as the tab does it
+def bench_forecast_loop(usage):
+    rows = list(zip(usage["Metric"], usage["Current Spend"].tolist()))
+
+    def run():
+        costs = []
+        for metric, planned in rows:
+            tier_table = rules.tier_table(metric)
+            unit_price = get_price(planned, tier_table) if tier_table is not None else default_unit_costs.get(metric, 0)
+            costs.append(planned * unit_price)
+        return sum(costs)
+    return run
+
+
+# The same planned costs priced per metric over whole columns
+def bench_forecast_vectorized(usage):
+    groups = [(metric, group.to_numpy()) for metric, group in usage.groupby("Metric")["Current Spend"]]
+    return lambda: sum(forecast_costs(metric, volumes, default_unit_costs).sum() for metric, volumes in groups)
+
+
+# Graduated (band by band) cost of the same volumes - one array operation per metric
+def bench_forecast_graduated(usage):
+    groups = [(metric, group.to_numpy()) for metric, group in usage.groupby("Metric")["Current Spend"]]
+    return lambda: sum(
+        forecast_costs(metric, volumes, default_unit_costs, GRADUATED).sum() for metric, volumes in groups
+    )
+
+
+# (name, case, max rows)
+CASES = (
+    ("get_price", bench_get_price, None),
+    ("calculate_cost_with_tiers", bench_calculate_cost_with_tiers, SCALAR_MAX_ROWS),
+    ("calculate_cost", bench_calculate_cost, SCALAR_MAX_ROWS),
+    ("compute_costs", bench_compute_costs, None),
+    ("period_transform", bench_period_transform, None),
+    ("forecast_loop", bench_forecast_loop, SCALAR_MAX_ROWS),
+    ("forecast_vectorized", bench_forecast_vectorized, None),
+    ("forecast_graduated", bench_forecast_graduated, None),
+)
+
+
+def measure(run, rows):
+    # Peak memory from one traced run, timing from untraced runs (tracing slows allocations down)
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best, spent = float("inf"), 0.0
+    while spent < MIN_CASE_SECONDS:
+        started = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - started
+        best, spent = min(best, elapsed), spent + elapsed
+    return {"rows": rows, "seconds": best, "rows_per_second": rows / max(best, 1e-9), "peak_mb": peak / 2 ** 20}
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, cases=None, log=sys.stdout):
+    results = {}
+    for rows in sizes:
+        usage = synthetic_usage(rows)
+        for name, case, max_rows in CASES:
+            if cases and name not in cases or max_rows and rows > max_rows:
+                continue
+            result = measure(case(usage), rows)
+            results.setdefault(name, {})[str(rows)] = result
+            print(f"{name:<28}{rows:>12,} rows {result['rows_per_second']:>16,.0f} rows/s "
+                  f"{result['peak_mb']:>10.1f} MB", file=log)
+    return results
+
+
+# Results that are slower or use more memory than the baseline by more than the threshold
+def find_regressions(results, baseline, threshold=DEFAULT_THRESHOLD):
+    regressions = []
+    for name, sizes in results.items():
+        for rows, result in sizes.items():
+            previous = baseline.get(name, {}).get(rows)
+            if previous is None:
+                continue
+            if result["rows_per_second"] < previous["rows_per_second"] * (1 - threshold):
+                regressions.append(
+                    f"{name} @ {rows} rows: {result['rows_per_second']:,.0f} rows/s "
+                    f"(baseline {previous['rows_per_second']:,.0f})"
+                )
+            if (result["peak_mb"] > previous["peak_mb"] * (1 + threshold)
+                    and result["peak_mb"] - previous["peak_mb"] > MEMORY_NOISE_MB):
+                regressions.append(
+                    f"{name} @ {rows} rows: peak {result['peak_mb']:.1f} MB (baseline {previous['peak_mb']:.1f} MB)"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pricing and aggregation hot paths.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="synthetic usage rows")
+    parser.add_argument("--cases", nargs="+", choices=[name for name, _, _ in CASES], help="cases to run (default: all)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="JSON baseline file")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="allowed regression (0.2 = 20%%)")
+    parser.add_argument("--save", action="store_true", help="write the results as the new baseline")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.sizes, args.cases)
+    baseline_path = Path(args.baseline)
+
+    if args.save:
+        # Keep baseline entries of cases and sizes that were not run this time
+        baseline = json.loads(baseline_path.read_text()) if baseline_path.exists() else {}
+        for name, sizes in results.items():
+            baseline.setdefault(name, {}).update(sizes)
+        baseline_path.write_text(json.dumps(baseline, indent=2, sort_keys=True))
+        print(f"baseline written to {baseline_path}")
+        return
+
+    if not baseline_path.exists():
+        print(f"no baseline at {baseline_path} - run with --save to create one")
+        return
+
+    regressions = find_regressions(results, json.loads(baseline_path.read_text()), args.threshold)
+    if regressions:
+        print("Regressions against the baseline:")
+        for regression in regressions:
+            print(f"- {regression}")
+        sys.exit(1)
+    print("no regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
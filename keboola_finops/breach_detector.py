@@ -0,0 +1,260 @@
+import calendar
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from .pricing_rules import FIXED, rules
+from .usage_loader import (
+    DATE_COLUMN, DEFAULT_CHUNKSIZE, METRIC_AGGREGATIONS, METRIC_COLUMN, PROJECT_COLUMN, VALUE_COLUMN, chunk_month_start,
+    iter_usage_chunks,
+)
+
+# Alert kinds
+LIMIT_BREACHED = "limit_breached"    # the month-to-date total is over the limit
+LIMIT_PROJECTED = "limit_projected"  # the run rate projects the month over the limit
+TIER_PROJECTED = "tier_projected"    # the projected overconsumption reaches a higher tier band
+
+# The run rate is only extrapolated once this many days of the month are covered - one day's usage
+# (a spike on the 1st) times ~30 projects volumes the rest of the month does not bear out
+MIN_ELAPSED_DAYS = 3.0
+
+SECONDS_PER_DAY = 86400.0
+
+
+# Days of the month covered up to a timestamp. Events stamped with a date only (or midnight,
+# as daily exports are) cover their whole day.
+def elapsed_days(timestamp):
+    if not isinstance(timestamp, datetime):
+        return float(timestamp.day)
+    seconds = timestamp.hour * 3600 + timestamp.minute * 60 + timestamp.second + timestamp.microsecond / 1e6
+    if seconds == 0:
+        return float(timestamp.day)
+    return timestamp.day - 1 + seconds / SECONDS_PER_DAY
+
+
+# Thresholds of a metric's monthly volume, in the order they are crossed: the limit, then the
+# volumes where the overconsumption moves into the next band of the metric's tier table
+def alert_thresholds(metric, limit):
+    thresholds = [(float(limit), LIMIT_PROJECTED, None)]
+    tier_table = rules.tier_table(metric)
+    if tier_table is not None:
+        for band, upper_bound in enumerate(tier_table.upper_bounds[:-1], start=1):
+            thresholds.append((float(limit + upper_bound), TIER_PROJECTED, band))
+    return thresholds
+
+
+# Month-to-date totals and run-rate projections per metric and per (metric, project), fed one
+# usage event at a time. Every event is a constant number of dict operations; alerts are raised
+# once per month when a threshold is first crossed.
+class BreachDetector:
+    def __init__(self, limits, aggregations=None):
+        self.limits = dict(limits)
+        self.aggregations = METRIC_AGGREGATIONS if aggregations is None else aggregations
+        # Fixed-price metrics (Premium SLA) have no limit to breach
+        self.thresholds = {
+            metric: alert_thresholds(metric, limit) for metric, limit in self.limits.items() if rules.kind(metric) != FIXED
+        }
+        self.month = None
+        self.late_events = 0
+        self._reset(None)
+
+    def _reset(self, month):
+        self.month = month
+        self.days_in_month = calendar.monthrange(*month)[1] if month else 0
+        self.elapsed = 0.0
+        self.totals = {}            # metric -> month-to-date total (level for latest / nunique)
+        self.project_totals = {}    # (metric, project) -> month-to-date total
+        self.project_days = {}      # (metric, project) -> day of the latest level (latest metrics)
+        self.distinct = {}          # metric -> projects seen this month (nunique metrics)
+        self.next_threshold = dict.fromkeys(self.thresholds, 0)
+        self.breached = set()
+        self.alerts = []
+
+    # Feed one event. Returns the alerts it raised (usually none).
+    def add(self, timestamp, project, metric, value):
+        month = (timestamp.year, timestamp.month)
+        if month != self.month:
+            if self.month is not None and month < self.month:
+                self.late_events += 1
+                return []
+            self._reset(month)
+        self.elapsed = max(self.elapsed, elapsed_days(timestamp))
+
+        how = self.aggregations.get(metric, "sum")
+        key = (metric, project)
+        if how == "sum":
+            self.totals[metric] = self.totals.get(metric, 0.0) + value
+            self.project_totals[key] = self.project_totals.get(key, 0.0) + value
+        elif how == "latest":
+            # A project's level is its latest day; the metric level is the sum over projects
+            day = timestamp.day
+            previous_day = self.project_days.get(key)
+            if previous_day is not None and day < previous_day:
+                return []
+            level = self.project_totals.get(key, 0.0)
+            new_level = level + value if day == previous_day else value
+            self.project_days[key] = day
+            self.project_totals[key] = new_level
+            self.totals[metric] = self.totals.get(metric, 0.0) + new_level - level
+        else:
+            projects = self.distinct.setdefault(metric, set())
+            if project in projects:
+                return []
+            projects.add(project)
+            self.project_totals[key] = 1
+            self.totals[metric] = len(projects)
+
+        if metric not in self.thresholds:
+            return []
+        return self._check(metric)
+
+    def _check(self, metric):
+        raised = []
+        total = self.totals[metric]
+        limit = self.limits[metric]
+        if total > limit and metric not in self.breached:
+            self.breached.add(metric)
+            raised.append(self._alert(metric, LIMIT_BREACHED, None, total))
+
+        projected = self.projected(metric)
+        thresholds = self.thresholds[metric]
+        index = self.next_threshold[metric]
+        while index < len(thresholds) and projected > thresholds[index][0]:
+            _, kind, band = thresholds[index]
+            raised.append(self._alert(metric, kind, band, projected))
+            index += 1
+        self.next_threshold[metric] = index
+
+        self.alerts.extend(raised)
+        return raised
+
+    def _alert(self, metric, kind, band, volume):
+        limit = self.limits[metric]
+        if kind == LIMIT_BREACHED:
+            message = f"Limit překročen: {volume:,.0f} / {limit:,.0f}"
+        elif kind == LIMIT_PROJECTED:
+            message = f"Při současném tempu {volume:,.0f} do konce měsíce, limit {limit:,.0f} bude překročen"
+        else:
+            price = rules.tier_table(metric).prices[band]
+            message = f"Nadspotřeba {volume - limit:,.0f} dosáhne pásma {band + 1} (${price:,.2f} za jednotku)"
+        return {
+            "metric": metric,
+            "kind": kind,
+            "band": band,
+            "month": f"{self.month[0]}-{self.month[1]:02d}",
+            "volume": volume,
+            "limit": limit,
+            "message": message,
+        }
+
+    # Volume at the end of the month at the current run rate - levels are not extrapolated, and
+    # neither is the first MIN_ELAPSED_DAYS of the month
+    def projected(self, metric, total=None):
+        total = self.totals.get(metric, 0.0) if total is None else total
+        if self.aggregations.get(metric, "sum") != "sum" or self.elapsed < MIN_ELAPSED_DAYS:
+            return total
+        return total * self.days_in_month / self.elapsed
+
+    # Feed a usage frame (date / project_id / metric / value) row by row, in date order
+    def add_events(self, frame):
+        frame = frame.dropna(subset=[DATE_COLUMN]).sort_values(DATE_COLUMN, kind="stable")
+        projects = frame[PROJECT_COLUMN] if PROJECT_COLUMN in frame else [None] * len(frame)
+        raised = []
+        for timestamp, project, metric, value in zip(
+            frame[DATE_COLUMN], projects, frame[METRIC_COLUMN].astype(object), frame[VALUE_COLUMN]
+        ):
+            raised += self.add(timestamp, project, metric, value)
+        return raised
+
+    # Alerts to show per metric this month: the breach, then the furthest threshold the current
+    # projection is over. Built from the current totals - a projection falls again as an early
+    # spike is averaged out, so the alerts raised at the crossing (self.alerts) can be stale.
+    def alerts_by_metric(self):
+        shown = {}
+        for metric, thresholds in self.thresholds.items():
+            if metric not in self.totals:
+                continue
+            alerts = []
+            total = self.totals[metric]
+            if total > self.limits[metric]:
+                alerts.append(self._alert(metric, LIMIT_BREACHED, None, total))
+            projected = self.projected(metric)
+            crossed = [threshold for threshold in thresholds if projected > threshold[0]]
+            if crossed:
+                _, kind, band = crossed[-1]
+                alerts.append(self._alert(metric, kind, band, projected))
+            if alerts:
+                shown[metric] = alerts
+        return shown
+
+    # Month-to-date total, run-rate projection and limit per metric
+    def snapshot(self):
+        metrics = list(dict.fromkeys([*self.limits, *self.totals]))
+        return pd.DataFrame({
+            "Metric": metrics,
+            "Month To Date": [self.totals.get(metric, 0.0) for metric in metrics],
+            "Projected": [self.projected(metric) for metric in metrics],
+            "Limit": [self.limits.get(metric, np.nan) for metric in metrics],
+        })
+
+    def project_snapshot(self):
+        keys = list(self.project_totals)
+        return pd.DataFrame({
+            "Metric": [metric for metric, _ in keys],
+            "Project": [project for _, project in keys],
+            "Month To Date": [self.project_totals[key] for key in keys],
+            "Projected": [self.projected(key[0], self.project_totals[key]) for key in keys],
+        })
+
+
+# Replay the latest month of a usage export through a detector. Exports are not sorted, so the
+# rows of the latest month seen so far are kept in one pass (dropped when a later month shows up)
+# and fed in date order at the end.
+def replay_export(path, limits, chunksize=DEFAULT_CHUNKSIZE, column_map=None):
+    detector = BreachDetector(limits)
+    month_start, month_rows = None, []
+    for chunk in iter_usage_chunks(path, chunksize, column_map):
+        chunk_start = chunk_month_start(chunk)
+        if chunk_start is None:
+            continue
+        if month_start is None or chunk_start > month_start:
+            month_start, month_rows = chunk_start, []
+        month_rows.append(chunk[chunk[DATE_COLUMN] >= month_start])
+    if month_rows:
+        detector.add_events(pd.concat(month_rows, ignore_index=True))
+    return detector
+
+
+def synthetic_events(events, seed=0, month=(2025, 3)):
+    rng = np.random.default_rng(seed)
+    metrics = np.array(rules.metrics, dtype=object)
+    seconds = np.sort(rng.uniform(0, 28 * SECONDS_PER_DAY, events))
+    start = pd.Timestamp(datetime(*month, 1))
+    return pd.DataFrame({
+        DATE_COLUMN: start + pd.to_timedelta(seconds, unit="s"),
+        PROJECT_COLUMN: rng.integers(0, 200, events).astype(str),
+        METRIC_COLUMN: metrics[rng.integers(0, len(metrics), events)],
+        VALUE_COLUMN: rng.exponential(1.0, events),
+    })
+
+
+# Events per second of the detector on one core, timestamps converted to datetimes up front
+# as a streaming consumer receives them
+def measure_throughput(events=200_000):
+    frame = synthetic_events(events)
+    limits = {metric: events / len(rules.metrics) for metric in rules.metrics}
+    rows = list(zip(
+        frame[DATE_COLUMN].dt.to_pydatetime(), frame[PROJECT_COLUMN], frame[METRIC_COLUMN], frame[VALUE_COLUMN].tolist()
+    ))
+    detector = BreachDetector(limits)
+    started = time.perf_counter()
+    for row in rows:
+        detector.add(*row)
+    elapsed = time.perf_counter() - started
+    return {"events": events, "seconds": elapsed, "events_per_second": events / elapsed, "alerts": len(detector.alerts)}
+
+
+if __name__ == "__main__":
+    print(measure_throughput())
@@ -0,0 +1,76 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_MAXSIZE = 256
+
+
+# Thread-safe LRU cache - Streamlit serves sessions from several threads of one process.
+# Cached values are shared between reruns and sessions, so callers must not mutate them.
+class LRUCache:
+    def __init__(self, maxsize=DEFAULT_MAXSIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        value = compute()
+
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+# Content hash of a usage snapshot (DataFrame) - equal data gives an equal key across reruns
+def snapshot_key(df):
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(",".join(map(str, df.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+# Content hash of the price vector: unit prices, overconsumption prices and compiled tier tables
+def price_key(unit_costs, overconsumption_costs=None, tier_tables=None):
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr(sorted(unit_costs.items())).encode())
+    digest.update(repr(sorted((overconsumption_costs or {}).items())).encode())
+    for name, table in sorted((tier_tables or {}).items()):
+        digest.update(name.encode())
+        for array in (table.lower_bounds, table.upper_bounds, table.prices):
+            digest.update(np.ascontiguousarray(array).tobytes())
+    return digest.hexdigest()
+
+
+# Key for a file on disk - changes whenever the file is rewritten
+def file_key(path):
+    stat = os.stat(path)
+    return f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+# Process-wide cache shared by all reruns and sessions
+results = LRUCache()
@@ -0,0 +1,129 @@
+import numpy as np
+
+from .money import format_money, format_quantity, from_micros, round_micros, to_micros
+from .pricing_rules import FIXED, TIERED, rules
+from .tiers import tier_table_of
+
+# Default over-limit premium for metrics priced by the premium rule
+OVER_LIMIT_PREMIUM = rules.over_limit_premium
+
+# Default prices with sales discount (current prices) per unit
+default_unit_costs = rules.unit_costs
+
+# Over-limit metrics priced from a tier table instead of the unit cost
+tier_tables = {metric: rules.tier_table(metric) for metric in rules.metrics if rules.kind(metric) == TIERED}
+
+
+# Function to calculate price based on volume - accepts a compiled TierTable or a raw pricing dict
+def get_price(volume, pricing_table):
+    return tier_table_of(pricing_table).price(volume)
+
+
+# Helper function for tiered pricing calculation
+def calculate_cost_with_tiers(spend, limit, pricing_table):
+    pricing_table = tier_table_of(pricing_table)
+    in_limit_cost = min(spend, limit) * get_price(limit, pricing_table)
+    if spend > limit:
+        over_limit = spend - limit
+        over_limit_cost = over_limit * get_price(over_limit, pricing_table)
+        return in_limit_cost + over_limit_cost
+    return in_limit_cost
+
+
+# Round raw micro amounts (floats) by the rounding rule of each row's metric
+def _round_costs(rows, raw_micros):
+    return round_micros(np.rint(raw_micros).astype(np.int64), rules.rounding_places[rows], rules.rounding_modes[rows])
+
+
+# Cost of quantities at unit prices (USD) in int64 micros, rounded by the metrics' rounding rules
+def line_cost_micros(metrics, quantities, unit_prices):
+    rows = rules.rows(metrics)
+    return _round_costs(rows, np.asarray(quantities, dtype=float) * to_micros(unit_prices))
+
+
+# Price whole columns at once in int64 micro-units. Returns (in_limit_cost, over_limit_cost, total);
+# each part is rounded by its metric's rounding rule and the total is their exact sum.
+# Inputs broadcast against each other, so one metric name can price a whole block of usage.
+def compute_cost_micros(metrics, spend, limit, unit_cost):
+    metrics = np.asarray(metrics, dtype=object)
+    spend = np.asarray(spend, dtype=float)
+    limit = np.asarray(limit, dtype=float)
+    unit_cost = np.asarray(unit_cost, dtype=float)
+    shape = np.broadcast_shapes(metrics.shape, spend.shape, limit.shape, unit_cost.shape)
+    if shape == ():
+        return tuple(a[0] for a in compute_cost_micros([metrics.item()], [spend], [limit], [unit_cost]))
+    spend, limit = (np.broadcast_to(a, shape) for a in (spend, limit))
+    unit_micros = np.broadcast_to(to_micros(unit_cost), shape)
+
+    # Look up the compiled rule of every row once, then dispatch on the rule arrays
+    rows = np.broadcast_to(rules.rows(metrics), shape)
+    kinds = rules.kinds[rows]
+    tier_ids = rules.tier_ids[rows]
+
+    over = spend > limit
+    in_limit = np.minimum(spend, limit)
+    over_limit = np.maximum(spend - limit, 0.0)
+
+    # Premium rule: in-limit at unit cost, over-limit at unit cost times the premium
+    in_limit_cost = np.where(over, in_limit, spend) * unit_micros
+    over_limit_cost = over_limit * unit_micros * rules.premiums[rows]
+
+    # Fixed rule: a fixed price regardless of the limit
+    fixed = kinds == FIXED
+    in_limit_cost[fixed] = spend[fixed] * unit_micros[fixed]
+    over_limit_cost[fixed] = 0.0
+
+    # Tiered rule: both parts priced from the metric's tier table once over the limit
+    for tier_id, pricing_table in enumerate(rules.tier_list):
+        tiered = over & (tier_ids == tier_id)
+        if not tiered.any():
+            continue
+        in_limit_cost[tiered] = in_limit[tiered] * to_micros(pricing_table.price(limit[tiered]))
+        over_limit_cost[tiered] = over_limit[tiered] * to_micros(pricing_table.price(over_limit[tiered]))
+
+    in_limit_cost = _round_costs(rows, in_limit_cost)
+    over_limit_cost = _round_costs(rows, over_limit_cost)
+    return in_limit_cost, over_limit_cost, in_limit_cost + over_limit_cost
+
+
+# Same as compute_cost_micros, in USD floats - for simulations and charts, not for totals
+def compute_costs(metrics, spend, limit, unit_cost):
+    return tuple(from_micros(a) for a in compute_cost_micros(metrics, spend, limit, unit_cost))
+
+
+# Build the explanation text for a single (displayed) row, with the amounts of compute_cost_micros.
+# Callers that already priced the row pass its (in_limit, over_limit, total) micros as `costs`.
+def explain_cost(metric, spend, limit, unit_cost, costs=None):
+    if costs is None:
+        costs = compute_cost_micros(metric, spend, limit, unit_cost)
+    in_limit_cost, over_limit_cost, cost = costs
+    if spend <= limit:
+        return f"{format_quantity(spend, separator='')} × ${unit_cost:.2f} = ${format_money(cost, separator='')}"
+
+    kind = rules.kind(metric)
+    if kind == FIXED:
+        return f"Fixní cena: ${format_money(cost, separator='')}"
+
+    in_limit = min(spend, limit)
+    over_limit = max(0, spend - limit)
+
+    if kind == TIERED:
+        pricing_table = rules.tier_table(metric)
+        in_limit_price = pricing_table.price(limit)
+        over_limit_price = pricing_table.price(over_limit)
+    else:
+        in_limit_price = unit_cost
+        over_limit_price = unit_cost * rules.premium(metric)
+
+    premium_note = "" if kind == TIERED else f" ({(rules.premium(metric) - 1) * 100:.0f}% navýšení)"
+    return f"""
+            <span style="color:#0066cc">V limitu:</span> {format_quantity(in_limit, separator='')} × ${in_limit_price:.2f} = ${format_money(in_limit_cost, separator='')}<br>
+            <span style="color:#ff6b6b">Nad limit:</span> {format_quantity(over_limit, separator='')} × ${over_limit_price:.2f}{premium_note} = ${format_money(over_limit_cost, separator='')}<br>
+            <span style="font-weight:bold">Celkem: ${format_money(cost, separator='')}</span>
+            """
+
+
+# Scalar wrapper kept for callers pricing a single metric - priced once, the explanation reuses the amounts
+def calculate_cost(metric, spend, limit, unit_cost):
+    costs = compute_cost_micros(metric, spend, limit, unit_cost)
+    return float(from_micros(costs[2])), explain_cost(metric, spend, limit, unit_cost, costs)
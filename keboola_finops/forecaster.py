@@ -0,0 +1,150 @@
+import json
+from datetime import date
+
+import numpy as np
+
+from .usage_loader import is_level_metric
+
+SEASON_LENGTH = 7  # weekly seasonality of daily usage
+MONTH_DAYS = 30
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS forecast_state (
+    series TEXT PRIMARY KEY,
+    state TEXT NOT NULL
+);
+"""
+
+
+# Additive Holt-Winters model (level + trend + weekly seasonality). Fitting runs over the
+# history once; every new observation afterwards is an O(1) update of the state. Observations
+# carry their ISO day: the seasonal index is the weekday, and a gap of missing days moves the
+# level along the trend, so a missing day does not shift the weekly pattern.
+class HoltWinters:
+    def __init__(self, alpha=0.3, beta=0.05, gamma=0.1, season_length=SEASON_LENGTH,
+                 level=0.0, trend=0.0, seasonal=None, step=0, last_day=None, checksum=None):
+        self.alpha = alpha
+        self.beta = beta
+        self.gamma = gamma
+        self.season_length = season_length
+        self.level = level
+        self.trend = trend
+        self.seasonal = list(seasonal) if seasonal is not None else [0.0] * season_length
+        self.step = step
+        self.last_day = last_day
+        self.checksum = checksum  # fingerprint of the stored days the model has seen (TrendForecaster)
+
+    @classmethod
+    def fit(cls, values, days=None, **params):
+        values = np.asarray(values, dtype=float)
+        days = list(days) if days is not None else [None] * len(values)
+        model = cls(**params)
+        length = model.season_length
+        if len(values) >= 2 * length:
+            first, second = values[:length], values[length:2 * length]
+            model.level = first.mean()
+            model.trend = (second.mean() - first.mean()) / length
+            for step, (value, day) in enumerate(zip(first, days)):
+                model.seasonal[model._season_index(day, step)] = value - first.mean()
+            start = length
+        elif len(values):
+            model.level = values[0]
+            start = 1
+        else:
+            start = 0
+        model.step = start
+        model.last_day = days[start - 1] if start else None
+        for value, day in zip(values[start:], days[start:]):
+            model.update(value, day)
+        return model
+
+    # Seasonal slot of an observation: its weekday when the day is known, else its position
+    def _season_index(self, day, step):
+        if day is None or self.season_length != SEASON_LENGTH:
+            return step % self.season_length
+        return date.fromisoformat(day).weekday()
+
+    def update(self, value, day=None):
+        index = self._season_index(day, self.step)
+        gap = (date.fromisoformat(day) - date.fromisoformat(self.last_day)).days if day and self.last_day else 1
+        gap = max(gap, 1)
+        season = self.seasonal[index]
+        previous_level = self.level
+        self.level = self.alpha * (value - season) + (1 - self.alpha) * (self.level + gap * self.trend)
+        self.trend = self.beta * (self.level - previous_level) / gap + (1 - self.beta) * self.trend
+        self.seasonal[index] = self.gamma * (value - self.level) + (1 - self.gamma) * season
+        self.step += 1
+        if day is not None:
+            self.last_day = day
+
+    def forecast(self, horizon):
+        steps = np.arange(1, horizon + 1)
+        if self.last_day is not None and self.season_length == SEASON_LENGTH:
+            slots = (date.fromisoformat(self.last_day).weekday() + steps) % self.season_length
+        else:
+            slots = (self.step + steps - 1) % self.season_length
+        seasonal = np.asarray(self.seasonal)[slots]
+        return np.maximum(self.level + steps * self.trend + seasonal, 0.0)
+
+    def to_json(self):
+        return json.dumps(self.__dict__)
+
+    @classmethod
+    def from_json(cls, text):
+        return cls(**json.loads(text))
+
+
+# Per-metric models kept next to the rollups in the SQLite store. sync() folds in only the
+# days newer than each model's last day, so a new day of data costs one O(1) update. Days up
+# to the last day are fingerprinted; when a backfill or a correction changes them, the model
+# is refitted from the whole history instead.
+class TrendForecaster:
+    def __init__(self, store):
+        self.store = store
+        self.connection = store.connection
+        self.connection.executescript(SCHEMA)
+        self.models = {
+            series: HoltWinters.from_json(state)
+            for series, state in self.connection.execute("SELECT series, state FROM forecast_state")
+        }
+
+    # Count, total and day-weighted total of a metric's stored days up to `last_day` - a
+    # backfilled day, a corrected value or a moved value all change it
+    def _checksum(self, metric, last_day):
+        return list(self.connection.execute(
+            "SELECT COUNT(*), TOTAL(value), TOTAL(value * (julianday(day) - 2451545)) FROM daily_usage "
+            "WHERE metric = ? AND day <= ?",
+            (metric, last_day),
+        ).fetchone())
+
+    def sync(self):
+        metrics = [metric for (metric,) in self.connection.execute("SELECT DISTINCT metric FROM daily_usage")]
+        with self.connection:
+            for metric in metrics:
+                model = self.models.get(metric)
+                if model is not None and (model.last_day is None or self._checksum(metric, model.last_day) != model.checksum):
+                    model = None
+                last_day = model.last_day if model else ""
+                rows = self.connection.execute(
+                    "SELECT day, value FROM daily_usage WHERE metric = ? AND day > ? ORDER BY day", (metric, last_day)
+                ).fetchall()
+                if not rows:
+                    continue
+                if model is None:
+                    model = HoltWinters.fit([value for _, value in rows], days=[day for day, _ in rows])
+                else:
+                    for day, value in rows:
+                        model.update(value, day)
+                model.checksum = self._checksum(metric, model.last_day)
+                self.models[metric] = model
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO forecast_state (series, state) VALUES (?, ?)", (metric, model.to_json())
+                )
+
+    # Forecast for the next month: the summed daily forecast for flows, the level at month end for levels
+    def forecast_month(self, metric, days=MONTH_DAYS):
+        model = self.models.get(metric)
+        if model is None:
+            return None
+        daily = model.forecast(days)
+        return float(daily[-1] if is_level_metric(metric) else daily.sum())
@@ -0,0 +1,102 @@
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+# Heavy dependencies whose import alone takes from tens to hundreds of milliseconds
+HEAVY_MODULES = ("numpy", "pandas", "pyarrow", "streamlit", "aiohttp")
+
+# Import budget per entry point: the most milliseconds a fresh interpreter may spend importing it
+# and the heavy modules it must not pull in. The pricing core needs NumPy for its vectorized
+# engine but never pandas; only the export loaders and stores load pandas.
+BUDGETS = {
+    "keboola_finops": (20, HEAVY_MODULES),
+    "keboola_finops.timing": (50, HEAVY_MODULES),
+    "keboola_finops.money": (250, ("pandas", "pyarrow", "streamlit", "aiohttp")),
+    "keboola_finops.pricing_rules": (250, ("pandas", "pyarrow", "streamlit", "aiohttp")),
+    "keboola_finops.cost_engine": (250, ("pandas", "pyarrow", "streamlit", "aiohttp")),
+    "keboola_finops.scenarios": (250, ("pandas", "pyarrow", "streamlit", "aiohttp")),
+    "keboola_finops.monte_carlo": (250, ("pandas", "pyarrow", "streamlit", "aiohttp")),
+    "keboola_finops.limit_optimizer": (250, ("pandas", "pyarrow", "streamlit", "aiohttp")),
+    "keboola_finops.usage_fetcher": (200, HEAVY_MODULES),
+    "keboola_finops.usage_loader": (1500, ("streamlit", "aiohttp")),
+    "keboola_finops.batch_pricing": (1500, ("streamlit", "aiohttp")),
+}
+
+DEFAULT_RUNS = 5
+
+# Run in a fresh interpreter: import one module, report the time and the heavy modules loaded
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+print(json.dumps({{"ms": elapsed * 1000, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+# Best-of-`runs` import time of a module in fresh interpreters, and the heavy modules it loaded
+def measure_import(module, runs=DEFAULT_RUNS):
+    root = Path(__file__).resolve().parent.parent
+    results = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", _PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            cwd=root, capture_output=True, text=True, check=True,
+        ).stdout
+        results.append(json.loads(output))
+    return min(result["ms"] for result in results), results[0]["loaded"]
+
+
+# Slowest imports below a module (-X importtime), to explain a blown budget
+def slowest_imports(module, count=10):
+    root = Path(__file__).resolve().parent.parent
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=root, capture_output=True, text=True, check=True,
+    ).stderr
+    rows = []
+    for line in stderr.splitlines()[1:]:
+        _, self_us, cumulative_us, name = (part.strip() for part in line.replace(":", "|", 1).split("|"))
+        rows.append((int(cumulative_us) / 1000, name))
+    return sorted(rows, reverse=True)[:count]
+
+
+# Measure every entry point against its budget. Returns (results, violations).
+def check_budgets(modules=None, runs=DEFAULT_RUNS):
+    results, violations = [], []
+    for module in modules or BUDGETS:
+        budget_ms, forbidden = BUDGETS[module]
+        ms, loaded = measure_import(module, runs)
+        results.append((module, ms, budget_ms, loaded))
+        if ms > budget_ms:
+            violations.append(f"{module}: {ms:.1f} ms > {budget_ms} ms budget")
+        for heavy in set(loaded) & set(forbidden):
+            violations.append(f"{module}: imports {heavy}")
+    return results, violations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the import-time budget of the package entry points.")
+    parser.add_argument("--modules", nargs="+", choices=list(BUDGETS), help="entry points to check (default: all)")
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS, help="fresh interpreters per entry point, best counts")
+    args = parser.parse_args()
+
+    results, violations = check_budgets(args.modules, args.runs)
+    for module, ms, budget_ms, loaded in results:
+        print(f"{module:34} {ms:8.1f} ms  (budget {budget_ms:5} ms)  {', '.join(loaded) or '-'}")
+    if violations:
+        print("Import budget exceeded:")
+        for violation in violations:
+            print(f"- {violation}")
+        for module in dict.fromkeys(violation.split(":")[0] for violation in violations):
+            print(f"Slowest imports of {module}:")
+            for ms, name in slowest_imports(module):
+                print(f"  {ms:8.1f} ms  {name}")
+        sys.exit(1)
+    print("all entry points within budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import time
+from statistics import NormalDist
+
+import numpy as np
+
+from .cost_engine import compute_cost_micros
+from .money import from_micros
+from .monte_carlo import MONTHS, lognormal_params
+from .pricing_rules import FIXED, rules
+
+# A usage distribution is summarised by at most this many equally likely monthly volumes
+MAX_POINTS = 256
+
+
+# Equally likely monthly volumes of a usage sample (history months or simulated paths):
+# the sample itself when small, its quantiles otherwise
+def usage_points(samples, max_points=MAX_POINTS):
+    samples = np.sort(np.asarray(samples, dtype=float).ravel())
+    if len(samples) <= max_points:
+        return samples
+    return np.quantile(samples, (np.arange(max_points) + 0.5) / max_points)
+
+
+# Equally likely monthly volumes of the lognormal usage distribution used by the Monte Carlo plan
+def lognormal_points(mean, std, points=MAX_POINTS):
+    if mean <= 0:
+        return np.zeros(1)
+    mu, sigma = lognormal_params([mean], [std])
+    normal = NormalDist()
+    z = np.array([normal.inv_cdf((i + 0.5) / points) for i in range(points)])
+    return np.exp(mu[0] + sigma[0] * z)
+
+
+# Limits where the expected cost can change slope or jump: every usage point (the over-limit part
+# starts there), the tier band edges (the in-limit price changes) and the usage points minus the
+# band edges (the over-limit volume changes band). Between two neighbours the cost is linear, so
+# the cheapest whole-unit limit is one of the candidates rounded down or up.
+def candidate_limits(metric, points):
+    candidates = [np.zeros(1), points]
+    tier_table = rules.tier_table(metric)
+    if tier_table is not None:
+        edges = np.concatenate([tier_table.lower_bounds, tier_table.upper_bounds])
+        edges = edges[np.isfinite(edges)]
+        candidates += [edges, (points[:, None] - edges[None, :]).ravel()]
+    candidates = np.concatenate(candidates)
+    candidates = candidates[candidates >= 0]
+    return np.unique(np.concatenate([np.floor(candidates), np.ceil(candidates)]))
+
+
+# Expected annual cost (micros) of committing to each monthly limit. The commitment is
+# take-or-pay: the limit is billed even when usage stays below it, usage over it is billed by
+# the metric's over-limit rule. One candidates x points block priced by compute_cost_micros.
+def expected_annual_cost(metric, limits, points, unit_cost, months=MONTHS):
+    limits = np.asarray(limits, dtype=float)[:, None]
+    billed = np.maximum(np.asarray(points, dtype=float)[None, :], limits)
+    _, _, monthly_costs = compute_cost_micros(metric, billed, limits, unit_cost)
+    return monthly_costs.mean(axis=1) * months
+
+
+# Cheapest monthly limit of one metric for a usage distribution.
+# Returns (limit, expected annual cost in micros).
+def optimize_limit(metric, points, unit_cost):
+    points = usage_points(points)
+    candidates = candidate_limits(metric, points)
+    costs = expected_annual_cost(metric, candidates, points, unit_cost)
+    best = int(np.argmin(costs))
+    return candidates[best], int(np.rint(costs[best]))
+
+
+# Recommended limits for every metric but the fixed-price ones. `points` holds one usage sample
+# (or set of equally likely volumes) per metric; the current limits are priced the same way.
+def optimize_limits(metrics, points, current_limits, unit_costs):
+    import pandas as pd
+
+    rows = []
+    for metric, metric_points, current_limit, unit_cost in zip(metrics, points, current_limits, unit_costs):
+        if rules.kind(metric) == FIXED:
+            continue
+        metric_points = usage_points(metric_points)
+        limit, cost = optimize_limit(metric, metric_points, unit_cost)
+        current_cost = int(np.rint(expected_annual_cost(metric, [current_limit], metric_points, unit_cost)[0]))
+        rows.append((metric, current_limit, limit, current_cost, cost))
+
+    frame = pd.DataFrame(rows, columns=["Metrika", "Současný limit", "Doporučený limit", "current", "optimal"])
+    frame["Roční náklady se současným limitem ($)"] = from_micros(frame.pop("current").to_numpy(dtype=np.int64))
+    frame["Roční náklady s doporučeným limitem ($)"] = from_micros(frame.pop("optimal").to_numpy(dtype=np.int64))
+    frame["Úspora ($)"] = frame["Roční náklady se současným limitem ($)"] - frame["Roční náklady s doporučeným limitem ($)"]
+    return frame
+
+
+# Time to optimize every metric from 100k simulated months per metric
+def measure_optimizer(samples=100_000, variability=0.3, seed=0):
+    rng = np.random.default_rng(seed)
+    metrics = rules.metrics
+    mean = np.array([28000 if m == "PPU" else 130 if rules.kind(m) != FIXED else 1 for m in metrics], dtype=float)
+    mu, sigma = lognormal_params(mean, mean * variability)
+    points = [rng.lognormal(mu[i], sigma[i], samples) for i in range(len(metrics))]
+    # Warm-up call: the first one also pays the pandas import of the result frame
+    optimize_limits(metrics[:1], points[:1], mean[:1], [rules.unit_costs.get(metrics[0], 0)])
+    started = time.perf_counter()
+    frame = optimize_limits(metrics, points, mean, [rules.unit_costs.get(m, 0) for m in metrics])
+    return frame, time.perf_counter() - started
+
+
+if __name__ == "__main__":
+    frame, seconds = measure_optimizer()
+    print(frame.to_string(index=False))
+    print(f"optimized {len(frame)} metrics in {seconds * 1000:.1f} ms")
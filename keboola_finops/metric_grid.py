@@ -0,0 +1,122 @@
+import html
+import time
+
+import numpy as np
+import pandas as pd
+
+from .money import format_quantity
+
+# Metrics per page in the batched grid
+PAGE_SIZE = 50
+
+# Above this many metrics the tabs switch to the batched grid by default
+BATCHED_THRESHOLD = 20
+
+# Styles for the batched grid, appended to the app CSS
+GRID_CSS = """
+    .metric-grid {
+        display: grid;
+        grid-template-columns: repeat(2, minmax(0, 1fr));
+        column-gap: 1rem;
+    }
+    .metric-grid .card h4 {
+        color: #1f77b4;
+        margin-bottom: 10px;
+    }
+    .progress {
+        background-color: #e9ecef;
+        border-radius: 4px;
+        height: 8px;
+        margin-top: 8px;
+    }
+    .progress > div {
+        background-color: #1f77b4;
+        border-radius: 4px;
+        height: 8px;
+    }
+"""
+
+
+def page_count(rows, page_size=PAGE_SIZE):
+    return max(1, -(-rows // page_size))
+
+
+def page_slice(frame, page, page_size=PAGE_SIZE):
+    start = (page - 1) * page_size
+    return frame.iloc[start:start + page_size]
+
+
+# Consumption in percent of the limit, computed for the whole column at once (0 when there is no limit)
+def progress_values(spend, limit):
+    spend = np.asarray(spend, dtype=float)
+    limit = np.asarray(limit, dtype=float)
+    ratio = np.divide(spend, limit, out=np.zeros_like(spend), where=limit > 0)
+    return (ratio * 100).astype(int)
+
+
+# Tab 1: consumption vs limit cards with progress bars and limit alerts, rendered as a single HTML block
+def consumption_grid_html(frame, alerts=None):
+    alerts = alerts or {}
+    progress = progress_values(frame["Current Spend"], frame["Limit"])
+    cards = [
+        f'<div class="card"><h4>{html.escape(str(metric))}</h4>'
+        f'<p><b>Spotřeba:</b> {format_quantity(spend)} / {format_quantity(limit)} ({value}%)</p>'
+        f'<div class="progress"><div style="width:{min(value, 100)}%"></div></div>'
+        + "".join(f'<p class="warning">⚠ {html.escape(message)}</p>' for message in alerts.get(metric, []))
+        + '</div>'
+        for metric, spend, limit, value in zip(frame["Metric"], frame["Current Spend"], frame["Limit"], progress)
+    ]
+    return f'<div class="metric-grid">{"".join(cards)}</div>'
+
+
+# Tab 3: cost cards with the calculation explanation, rendered as a single HTML block
+def cost_grid_html(frame, details):
+    # Indented explanation lines would turn into Markdown code blocks inside one long block
+    details = ["".join(line.strip() for line in detail.splitlines()) for detail in details]
+    cards = [
+        f'<div class="card"><h4>{html.escape(str(metric))}</h4>'
+        f'<p><b>Aktuální spotřeba:</b> {format_quantity(spend)}</p>'
+        f'<p><b>Limit:</b> {format_quantity(limit)}</p>'
+        f'<p><b>Výpočet:</b><br>{detail}</p></div>'
+        for metric, spend, limit, detail in zip(frame["Metric"], frame["Current Spend"], frame["Limit"], details)
+    ]
+    return f'<div class="metric-grid">{"".join(cards)}</div>'
+
+
+def synthetic_usage(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "Metric": [f"Projekt {i} - PPU" for i in range(rows)],
+        "Current Spend": rng.integers(0, 30000, rows),
+        "Limit": rng.integers(1, 30000, rows),
+    })
+
+
+# Time building the batched grid for 10, 100 and 1,000 metrics, both unpaginated and for the
+# displayed page. The per-metric layout sends two deltas per metric (card + progress bar);
+# the batched grid sends one.
+def measure_render_times(sizes=(10, 100, 1000), repeat=20):
+    results = []
+    for rows in sizes:
+        frame = synthetic_usage(rows)
+        timings = {}
+        for name, shown in (("full", frame), ("page", page_slice(frame, 1))):
+            started = time.perf_counter()
+            for _ in range(repeat):
+                grid_html = consumption_grid_html(shown)
+            timings[name] = ((time.perf_counter() - started) / repeat * 1000, len(grid_html) / 1024)
+        results.append({
+            "metrics": rows,
+            "full_grid_ms": timings["full"][0],
+            "full_grid_kb": timings["full"][1],
+            "page_ms": timings["page"][0],
+            "page_kb": timings["page"][1],
+            "pages": page_count(rows),
+            "deltas_per_metric_layout": 2 * rows,
+            "deltas_batched": 1,
+        })
+    return pd.DataFrame(results)
+
+
+if __name__ == "__main__":
+    print(measure_render_times().to_string(index=False))
@@ -0,0 +1,92 @@
+import numpy as np
+
+# Money is held as int64 micro-units (1 USD = 1,000,000 micros). Sums of int64 are exact and
+# vectorized; int64 covers amounts up to about 9.2 trillion USD.
+MICROS = 1_000_000
+MICRO_PLACES = 6
+
+# Rounding modes of the pricing rules, stored as small integer codes in the rule table
+HALF_UP = 0    # ties away from zero (commercial rounding)
+HALF_EVEN = 1  # ties to the even neighbour (banker's rounding)
+UP = 2         # away from zero
+DOWN = 3       # toward zero
+ROUNDING_MODES = {"half_up": HALF_UP, "half_even": HALF_EVEN, "up": UP, "down": DOWN}
+
+
+# Amounts in USD (floats or arrays of floats) to int64 micros, nearest micro
+def to_micros(amounts):
+    micros = np.rint(np.asarray(amounts, dtype=float) * MICROS).astype(np.int64)
+    return micros if micros.ndim else np.int64(micros)
+
+
+# Micros back to USD floats - for charts and statistics, not for totals
+def from_micros(micros):
+    amounts = np.asarray(micros, dtype=np.int64) / MICROS
+    return amounts if amounts.ndim else float(amounts)
+
+
+# Rule arrays where every row has the same value collapse to a scalar (the usual case)
+def _uniform(values):
+    if values.ndim and values.size and (values == values.flat[0]).all():
+        return values.flat[0]
+    return values
+
+
+def _round_away(mode, quotient, remainder, step):
+    if mode == HALF_UP:
+        return 2 * remainder >= step
+    if mode == HALF_EVEN:
+        return (2 * remainder > step) | ((2 * remainder == step) & (quotient % 2 == 1))
+    if mode == UP:
+        return remainder > 0
+    return np.zeros(np.shape(remainder), dtype=bool)
+
+
+# Round micros to `places` decimal places of a USD with the given rounding mode code.
+# places and mode may be arrays (one rule per row) broadcasting against micros.
+def round_micros(micros, places=2, mode=HALF_UP):
+    micros = np.asarray(micros, dtype=np.int64)
+    places = _uniform(np.asarray(places, dtype=np.int64))
+    mode = _uniform(np.asarray(mode))
+    step = 10 ** (MICRO_PLACES - np.minimum(places, MICRO_PLACES))
+
+    # Round the magnitude, then put the sign back, so modes are symmetric around zero
+    magnitude = np.abs(micros)
+    quotient, remainder = np.divmod(magnitude, step)
+    if mode.ndim == 0:
+        round_away = _round_away(int(mode), quotient, remainder, step)
+    else:
+        round_away = np.select(
+            [mode == code for code in ROUNDING_MODES.values()],
+            [_round_away(code, quotient, remainder, step) for code in ROUNDING_MODES.values()],
+        )
+    rounded = np.sign(micros) * (quotient + round_away) * step
+    return rounded if rounded.ndim else np.int64(rounded)
+
+
+# Exact sum of micro amounts
+def total_micros(micros):
+    return int(np.sum(np.asarray(micros, dtype=np.int64), dtype=np.int64))
+
+
+# Micros as a USD string with thousands separators ("1,234.56"), rounded half-up to `places`.
+# Built from the integer parts, so large amounts keep every cent.
+def format_money(micros, places=2, separator=","):
+    micros = int(round_micros(micros, places, HALF_UP))
+    sign = "-" if micros < 0 else ""
+    whole, fraction = divmod(abs(micros), MICROS)
+    whole = f"{whole:,}".replace(",", separator)
+    if places == 0:
+        return f"{sign}{whole}"
+    return f"{sign}{whole}.{fraction // 10 ** (MICRO_PLACES - places):0{places}d}"
+
+
+# Usage quantity for display: whole numbers as they are, fractional ones (summed decimal usage) to
+# two decimals, so an export with one fractional metric does not print "5.0" for the others
+def format_quantity(value, separator=","):
+    text = f"{int(value):,}" if float(value).is_integer() else f"{value:,.2f}"
+    return text.replace(",", separator)
+
+
+def format_money_column(micros, places=2, separator=","):
+    return [format_money(value, places, separator) for value in np.asarray(micros, dtype=np.int64)]
@@ -0,0 +1,81 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .cost_engine import compute_costs
+from .pricing_rules import FIXED, rules
+
+MONTHS = 12
+PERCENTILES = (50, 90, 99)
+DEFAULT_CHUNK_PATHS = 50_000
+
+
+# Per-metric mean and standard deviation of monthly usage from a bucket x metric history frame of
+# whole months (RollupStore.history(complete=True) - a partial month would drag the mean down)
+def history_stats(history, metrics):
+    history = history.reindex(columns=metrics).fillna(0)
+    std = history.std(ddof=1) if len(history) > 1 else history.mean() * 0
+    return history.mean().to_numpy(), std.fillna(0).to_numpy()
+
+
+# Lognormal parameters matching a mean and standard deviation (usage is never negative)
+def lognormal_params(mean, std):
+    mean = np.asarray(mean, dtype=float)
+    ratio = np.divide(std, mean, out=np.zeros_like(mean), where=mean > 0)
+    sigma = np.sqrt(np.log1p(ratio ** 2))
+    mu = np.log(np.where(mean > 0, mean, 1.0)) - sigma ** 2 / 2
+    return mu, sigma
+
+
+# Worker: simulate one chunk of yearly usage paths and price every month of every path.
+# Returns (annual costs, limit breached) as metrics x paths arrays.
+def simulate_chunk(seed, paths, metrics, mean, std, limits, unit_costs, months=MONTHS):
+    rng = np.random.default_rng(seed)
+    mu, sigma = lognormal_params(mean, std)
+    annual_costs = np.empty((len(metrics), paths))
+    breached = np.empty((len(metrics), paths), dtype=bool)
+
+    for i, metric in enumerate(metrics):
+        if rules.kind(metric) == FIXED or mean[i] <= 0:
+            # Fixed-price metrics (Premium SLA) do not vary between paths
+            usage = np.full((paths, months), max(mean[i], 0.0))
+        else:
+            usage = rng.lognormal(mu[i], sigma[i], size=(paths, months))
+        # Every month is priced with the tiered / 30%-premium over-limit rules of calculate_cost
+        _, _, monthly_costs = compute_costs(metric, usage, limits[i], unit_costs[i])
+        annual_costs[i] = monthly_costs.sum(axis=1)
+        breached[i] = (usage > limits[i]).any(axis=1)
+
+    return annual_costs, breached
+
+
+# Simulate `paths` yearly usage paths per metric, split into seeded chunks across worker processes.
+# Returns a frame with P50/P90/P99 annual cost and the probability of breaching each limit.
+def simulate(metrics, mean, std, limits, unit_costs, paths=100_000, workers=None, seed=None,
+             chunk_paths=DEFAULT_CHUNK_PATHS):
+    import pandas as pd
+
+    metrics = list(metrics)
+    mean, std, limits, unit_costs = (np.asarray(a, dtype=float) for a in (mean, std, limits, unit_costs))
+    sizes = [min(chunk_paths, paths - start) for start in range(0, paths, chunk_paths)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    args = [(chunk_seed, size, metrics, mean, std, limits, unit_costs) for chunk_seed, size in zip(seeds, sizes)]
+
+    workers = min(workers or os.cpu_count() or 1, len(sizes))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(simulate_chunk, *zip(*args)))
+    else:
+        results = [simulate_chunk(*chunk_args) for chunk_args in args]
+
+    annual_costs = np.concatenate([costs for costs, _ in results], axis=1)
+    breached = np.concatenate([flags for _, flags in results], axis=1)
+    totals = annual_costs.sum(axis=0)
+
+    summary = pd.DataFrame({"Metrika": metrics + ["Celkem"]})
+    for p in PERCENTILES:
+        per_metric = np.percentile(annual_costs, p, axis=1)
+        summary[f"P{p} ($)"] = np.append(per_metric, np.percentile(totals, p))
+    summary["Pravděpodobnost překročení limitu"] = np.append(breached.mean(axis=1), breached.any(axis=0).mean())
+    return summary
@@ -0,0 +1,236 @@
+import json
+import os
+from numbers import Real
+from pathlib import Path
+
+import numpy as np
+
+from .money import MICRO_PLACES, ROUNDING_MODES
+from .tiers import TierTable
+
+DEFAULT_RULES_PATH = Path(__file__).with_name("pricing_rules.json")
+RULES_PATH_ENV = "KEBOOLA_PRICING_RULES"
+
+# Rule kinds, stored as small integer codes in the compiled rule table
+PREMIUM = 0  # in-limit at the unit cost, over-limit at the unit cost times a premium
+TIERED = 1   # once over the limit, both parts are priced from a tier table
+FIXED = 2    # fixed price, the limit does not apply
+RULE_KINDS = {"premium": PREMIUM, "tiered": TIERED, "fixed": FIXED}
+
+AGGREGATIONS = ("sum", "nunique", "latest")
+
+# Columns up to this size are looked up metric by metric, longer ones through a pandas index
+SMALL_LOOKUP = 64
+
+# Cost rounding when neither the config nor the metric sets one: cents, ties away from zero
+DEFAULT_ROUNDING = {"places": 2, "mode": "half_up"}
+
+
+class PricingRuleError(ValueError):
+    pass
+
+
+def _is_number(value):
+    return isinstance(value, Real) and not isinstance(value, bool)
+
+
+# Keys the config may use at each level - anything else is reported, so a typo such as
+# "premuim" does not silently fall back to the default
+CONFIG_KEYS = ("over_limit_premium", "rounding", "tier_tables", "metrics")
+BAND_KEYS = ("min", "max", "discount", "price")
+RULE_KEYS = (
+    "rule", "tier_table", "basic_cost", "unit_cost", "overconsumption_cost", "yearly_limit", "premium",
+    "aggregation", "rounding",
+)
+ROUNDING_KEYS = ("places", "mode")
+
+
+def _check_keys(values, allowed, where, errors):
+    for key in values:
+        if key not in allowed:
+            errors.append(f"{where}: unknown key {key!r}")
+
+
+def _validate_rounding(rounding, where, errors):
+    if not isinstance(rounding, dict):
+        errors.append(f"{where}: rounding must be an object with places and mode")
+        return
+    _check_keys(rounding, ROUNDING_KEYS, f"{where} rounding", errors)
+    places = rounding.get("places", DEFAULT_ROUNDING["places"])
+    if not isinstance(places, int) or isinstance(places, bool) or not 0 <= places <= MICRO_PLACES:
+        errors.append(f"{where}: rounding places must be an integer from 0 to {MICRO_PLACES}")
+    mode = rounding.get("mode", DEFAULT_ROUNDING["mode"])
+    if not isinstance(mode, str) or mode not in ROUNDING_MODES:
+        errors.append(f"{where}: rounding mode must be one of {', '.join(ROUNDING_MODES)}")
+
+
+def _validate_bands(name, bands, errors):
+    if not isinstance(bands, list):
+        errors.append(f"tier table {name!r} must be a list of bands")
+        return
+    if not bands:
+        errors.append(f"tier table {name!r} has no bands")
+    previous_max = None
+    for i, band in enumerate(bands):
+        where = f"tier table {name!r} band {i}"
+        if not isinstance(band, dict):
+            errors.append(f"{where}: must be an object with min, max and price")
+            previous_max = None
+            continue
+        _check_keys(band, BAND_KEYS, where, errors)
+        if "discount" in band and not _is_number(band["discount"]):
+            errors.append(f"{where}: discount must be a number")
+        if not _is_number(band.get("min")) or not _is_number(band.get("price")):
+            errors.append(f"{where}: min and price must be numbers")
+            previous_max = None
+            continue
+        if band.get("max") is None and i != len(bands) - 1:
+            errors.append(f"{where}: only the last band may be open-ended")
+        if previous_max is not None and band["min"] <= previous_max:
+            errors.append(f"{where}: overlaps the previous band")
+        # Only a valid upper bound is compared with the next band
+        previous_max = None
+        if band.get("max") is not None:
+            if not _is_number(band["max"]) or band["max"] < band["min"]:
+                errors.append(f"{where}: max must be a number not below min")
+            else:
+                previous_max = band["max"]
+
+
+def _validate_rule(metric, rule, tier_tables, errors):
+    where = f"metric {metric!r}"
+    if not isinstance(rule, dict):
+        errors.append(f"{where}: rule must be an object")
+        return
+    _check_keys(rule, RULE_KEYS, where, errors)
+    if not isinstance(rule.get("rule"), str) or rule["rule"] not in RULE_KINDS:
+        errors.append(f"{where}: rule must be one of {', '.join(RULE_KINDS)}")
+    if rule.get("rule") == "tiered" and (not isinstance(rule.get("tier_table"), str) or rule["tier_table"] not in tier_tables):
+        errors.append(f"{where}: unknown tier table {rule.get('tier_table')!r}")
+    if "premium" in rule and (not _is_number(rule["premium"]) or rule["premium"] <= 0):
+        errors.append(f"{where}: premium must be a positive number")
+    for key in ("basic_cost", "unit_cost", "overconsumption_cost", "yearly_limit"):
+        if key in rule and (not _is_number(rule[key]) or rule[key] < 0):
+            errors.append(f"{where}: {key} must be a non-negative number")
+    if not isinstance(rule.get("aggregation", "sum"), str) or rule.get("aggregation", "sum") not in AGGREGATIONS:
+        errors.append(f"{where}: aggregation must be one of {', '.join(AGGREGATIONS)}")
+    if "rounding" in rule:
+        _validate_rounding(rule["rounding"], where, errors)
+
+
+# Collect every problem in the config instead of stopping at the first one
+def validate(config):
+    if not isinstance(config, dict):
+        raise PricingRuleError("Invalid pricing rules:\n- the config must be an object")
+    errors = []
+    _check_keys(config, CONFIG_KEYS, "config", errors)
+    if not _is_number(config.get("over_limit_premium")) or config["over_limit_premium"] <= 0:
+        errors.append("over_limit_premium must be a positive number")
+    if "rounding" in config:
+        _validate_rounding(config["rounding"], "config", errors)
+
+    tier_tables = config.get("tier_tables", {})
+    if not isinstance(tier_tables, dict):
+        errors.append("tier_tables must be an object mapping table names to bands")
+        tier_tables = {}
+    for name, bands in tier_tables.items():
+        _validate_bands(name, bands, errors)
+
+    metrics = config.get("metrics")
+    if not isinstance(metrics, dict):
+        errors.append("metrics must be an object mapping metric names to rules")
+        metrics = {}
+    elif not metrics:
+        errors.append("no metrics defined")
+    for metric, rule in metrics.items():
+        _validate_rule(metric, rule, tier_tables, errors)
+
+    if errors:
+        raise PricingRuleError("Invalid pricing rules:\n" + "\n".join(f"- {e}" for e in errors))
+
+
+# Pricing rules compiled into per-metric arrays (rule kind, tier table id, premium factor, rounding).
+# The last row is the default rule for metrics missing from the config.
+class RuleTable:
+    def __init__(self, config):
+        validate(config)
+        self.over_limit_premium = float(config["over_limit_premium"])
+
+        # Tier tables in the {(min_vol, max_vol): {'discount': ..., 'price': ...}} shape used by get_price
+        self.pricing_tables = {
+            name: {
+                (band["min"], float("inf") if band.get("max") is None else band["max"]):
+                    {"discount": band.get("discount", 0.0), "price": band["price"]}
+                for band in bands
+            }
+            for name, bands in config.get("tier_tables", {}).items()
+        }
+        self.tier_names = list(self.pricing_tables)
+        self.tier_list = [TierTable(self.pricing_tables[name]) for name in self.tier_names]
+
+        metrics = config["metrics"]
+        self.metrics = list(metrics)
+        self.default_row = len(self.metrics)
+        self._index = None
+        self._rows = {metric: row for row, metric in enumerate(self.metrics)}
+        self.kinds = np.array([RULE_KINDS[r["rule"]] for r in metrics.values()] + [PREMIUM], dtype=np.int8)
+        self.tier_ids = np.array(
+            [self.tier_names.index(r["tier_table"]) if r["rule"] == "tiered" else -1 for r in metrics.values()] + [-1],
+            dtype=np.int16,
+        )
+        self.premiums = np.array(
+            [float(r.get("premium", self.over_limit_premium)) for r in metrics.values()] + [self.over_limit_premium]
+        )
+
+        # Cost rounding per metric: decimal places of a USD and rounding mode code
+        default_rounding = {**DEFAULT_ROUNDING, **config.get("rounding", {})}
+        roundings = [{**default_rounding, **r.get("rounding", {})} for r in metrics.values()] + [default_rounding]
+        self.rounding_places = np.array([r["places"] for r in roundings], dtype=np.int64)
+        self.rounding_modes = np.array([ROUNDING_MODES[r["mode"]] for r in roundings], dtype=np.int8)
+
+        # Per-metric values read by the UI and the loaders
+        self.basic_costs = {m: float(r["basic_cost"]) for m, r in metrics.items() if "basic_cost" in r}
+        self.unit_costs = {m: float(r["unit_cost"]) for m, r in metrics.items() if "unit_cost" in r}
+        self.overconsumption_costs = {
+            m: float(r["overconsumption_cost"]) for m, r in metrics.items() if "overconsumption_cost" in r
+        }
+        self.yearly_limits = {m: r["yearly_limit"] for m, r in metrics.items() if "yearly_limit" in r}
+        self.aggregations = {m: r.get("aggregation", "sum") for m, r in metrics.items()}
+
+    # Rule row of every metric - one hash lookup for the whole column. pandas is only imported
+    # for long columns, so pricing a handful of metrics does not load it.
+    def rows(self, metrics):
+        metrics = np.asarray(metrics, dtype=object)
+        if metrics.ndim == 0:
+            return np.intp(self._rows.get(metrics.item(), self.default_row))
+        if metrics.size <= SMALL_LOOKUP:
+            rows = [self._rows.get(metric, self.default_row) for metric in metrics.ravel()]
+            return np.array(rows, dtype=np.intp).reshape(metrics.shape)
+        if self._index is None:
+            import pandas as pd
+
+            self._index = pd.Index(self.metrics)
+        rows = self._index.get_indexer(metrics.ravel()).reshape(metrics.shape)
+        rows[rows < 0] = self.default_row
+        return rows
+
+    def kind(self, metric):
+        return int(self.kinds[self.rows(metric)])
+
+    def premium(self, metric):
+        return float(self.premiums[self.rows(metric)])
+
+    # Compiled tier table of a tiered metric, None for the others
+    def tier_table(self, metric):
+        tier_id = self.tier_ids[self.rows(metric)]
+        return self.tier_list[tier_id] if tier_id >= 0 else None
+
+
+def load_rules(path=None):
+    path = Path(path or os.environ.get(RULES_PATH_ENV) or DEFAULT_RULES_PATH)
+    with open(path, encoding="utf-8") as f:
+        return RuleTable(json.load(f))
+
+
+# Rules compiled once at startup
+rules = load_rules()
@@ -0,0 +1,259 @@
+import argparse
+import csv
+import hashlib
+import html
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+from string import Template
+
+import numpy as np
+import pandas as pd
+
+from .batch_pricing import CONTRACT_COLUMN, LIMIT_COLUMN, METRIC_COLUMN, SPEND_COLUMN, price_contracts, read_contracts
+from .cost_engine import line_cost_micros
+from .money import format_money, format_quantity, from_micros, total_micros
+from .pricing_rules import FIXED, rules
+
+PLANNED_COLUMN = "planned"  # optional - planned usage for the Tab 4 table, defaults to the spend
+
+REPORT_FORMATS = ("html", "xlsx")
+DEFAULT_TEMPLATE = Path(__file__).with_name("report_template.html")
+DEFAULT_BATCH_CUSTOMERS = 100  # customers rendered per worker task
+
+# Styles of the HTML report - the card / total-box look of the app, plus plain tables
+REPORT_CSS = """
+    body {
+        font-family: sans-serif;
+        margin: 2rem;
+        color: #262730;
+    }
+    h1 {
+        color: #1f77b4;
+    }
+    .header-card {
+        background-color: #f0f2f6;
+        padding: 10px;
+        border-radius: 5px;
+        margin-bottom: 15px;
+    }
+    table {
+        border-collapse: collapse;
+        width: 100%;
+    }
+    th, td {
+        border-bottom: 1px solid #e6e9ef;
+        padding: 6px 10px;
+        text-align: right;
+    }
+    th:first-child, td:first-child {
+        text-align: left;
+    }
+    .total-box {
+        background-color: #1f77b4;
+        color: white;
+        padding: 15px;
+        border-radius: 5px;
+        text-align: center;
+        margin-top: 20px;
+    }
+    .total-box h2 {
+        margin: 0;
+    }
+"""
+
+
+# Strip comments and whitespace from a stylesheet - done once per worker, not per report
+def compile_css(css):
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.DOTALL)
+    css = re.sub(r"\s+", " ", css)
+    return re.sub(r"\s*([{};:,>])\s*", r"\1", css).strip()
+
+
+def load_template(path=DEFAULT_TEMPLATE):
+    return Template(Path(path).read_text(encoding="utf-8"))
+
+
+# Tab 4 "Plánování" rows: tiered metrics price the planned volume at its band price, the others
+# at the unit cost; fixed-price metrics keep their current volume. Returns (unit prices, costs in micros).
+def forecast_micros(metrics, planned, unit_costs):
+    metrics = np.asarray(metrics, dtype=object)
+    planned = np.asarray(planned, dtype=float)
+    unit_prices = np.asarray(unit_costs, dtype=float).copy()
+    tier_ids = rules.tier_ids[rules.rows(metrics)]
+    for tier_id, tier_table in enumerate(rules.tier_list):
+        tiered = tier_ids == tier_id
+        if tiered.any():
+            unit_prices[tiered] = tier_table.price(planned[tiered])
+    return unit_prices, line_cost_micros(metrics, planned, unit_prices)
+
+
+# File name of a customer's reports: the readable part of the ID plus a short hash of the whole
+# ID, so IDs that only differ in replaced characters ("acme/1", "acme_1") never share a file
+def report_filename(customer):
+    readable = re.sub(r"[^\w.-]+", "_", str(customer)).strip("._") or "customer"
+    return f"{readable}-{hashlib.sha1(str(customer).encode()).hexdigest()[:8]}"
+
+
+def render_html(template, css, customer, period, cost_rows, forecast_rows):
+    cost_html = "\n".join(
+        f"<tr><td>{html.escape(str(metric))}</td><td>{format_quantity(spend)}</td><td>{format_quantity(limit)}</td>"
+        f"<td>{format_money(cost)}</td></tr>"
+        for metric, spend, limit, cost in cost_rows
+    )
+    forecast_html = "\n".join(
+        f"<tr><td>{html.escape(str(metric))}</td><td>{format_quantity(planned)}</td><td>{price:,.2f}</td>"
+        f"<td>{format_money(cost)}</td></tr>"
+        for metric, planned, price, cost in forecast_rows
+    )
+    return template.substitute(
+        css=css,
+        customer=html.escape(str(customer)),
+        period=html.escape(period),
+        generated=datetime.now().strftime("%Y-%m-%d %H:%M"),
+        cost_rows=cost_html,
+        cost_total=format_money(total_micros([cost for *_, cost in cost_rows])),
+        forecast_rows=forecast_html,
+        forecast_total=format_money(total_micros([cost for *_, cost in forecast_rows])),
+    )
+
+
+# Workbook with the two tables as sheets, money as numbers. A report is a few kilobytes, so the
+# workbook is assembled in memory and written in one go - xlsxwriter's temporary files per
+# sheet part would cost more than the rendering itself.
+def write_xlsx(path, customer, period, cost_rows, forecast_rows):
+    import xlsxwriter
+
+    with xlsxwriter.Workbook(str(path), {"in_memory": True}) as workbook:
+        bold = workbook.add_format({"bold": True})
+        money = workbook.add_format({"num_format": "#,##0.00"})
+        bold_money = workbook.add_format({"num_format": "#,##0.00", "bold": True})
+        sheets = (
+            ("Souhrn nákladů", ["Metrika", "Aktuální spotřeba", "Limit", "Vypočítaná cena ($)"], cost_rows,
+             "Celkové náklady"),
+            ("Plánování", ["Metrika", "Plánovaná spotřeba", "Cena za jednotku ($)", "Celková cena ($)"], forecast_rows,
+             "Celkové plánované náklady"),
+        )
+        for name, header, rows, total_label in sheets:
+            sheet = workbook.add_worksheet(name)
+            sheet.set_column(0, 0, 24)
+            sheet.set_column(1, 3, 20)
+            sheet.write_row(0, 0, [f"{customer} - {period}"], bold)
+            sheet.write_row(2, 0, header, bold)
+            for row, (metric, quantity, value, cost) in enumerate(rows, start=3):
+                sheet.write_string(row, 0, str(metric))
+                sheet.write_number(row, 1, float(quantity))
+                sheet.write_number(row, 2, float(value), money if name == "Plánování" else None)
+                sheet.write_number(row, 3, from_micros(cost), money)
+            total_row = len(rows) + 3
+            sheet.write_string(total_row, 0, total_label, bold)
+            sheet.write_number(total_row, 3, from_micros(total_micros([cost for *_, cost in rows])), bold_money)
+
+
+# Template and stylesheet of the worker process, loaded once by init_worker
+_template = None
+_css = None
+
+
+def init_worker(template_path=DEFAULT_TEMPLATE):
+    global _template, _css
+    _template = load_template(template_path)
+    _css = compile_css(REPORT_CSS)
+
+
+# Worker: price one batch of customers in a single vectorized pass, then write each customer's
+# reports straight to disk. Returns (customer, total cost, planned cost, files) per customer.
+def render_batch(batch, output_dir, formats, period):
+    priced = price_contracts(batch)
+    planned = batch[PLANNED_COLUMN].fillna(batch[SPEND_COLUMN]) if PLANNED_COLUMN in batch else batch[SPEND_COLUMN]
+    fixed = np.array([rules.kind(metric) == FIXED for metric in batch[METRIC_COLUMN]], dtype=bool)
+    planned = np.where(fixed, batch[SPEND_COLUMN].to_numpy(dtype=float), planned.to_numpy(dtype=float))
+    unit_prices, forecast_costs = forecast_micros(batch[METRIC_COLUMN].to_numpy(), planned, priced["unit_cost"].to_numpy())
+
+    metrics = batch[METRIC_COLUMN].to_numpy()
+    spend = batch[SPEND_COLUMN].to_numpy()
+    limits = batch[LIMIT_COLUMN].to_numpy()
+    costs = priced["total_cost_micros"].to_numpy()
+
+    output_dir = Path(output_dir)
+    results = []
+    for customer, positions in batch.groupby(CONTRACT_COLUMN, sort=False).indices.items():
+        cost_rows = list(zip(metrics[positions], spend[positions], limits[positions], costs[positions]))
+        forecast_rows = list(zip(metrics[positions], planned[positions], unit_prices[positions], forecast_costs[positions]))
+        name = report_filename(customer)
+        files = []
+        if "html" in formats:
+            path = output_dir / f"{name}.html"
+            path.write_text(render_html(_template, _css, customer, period, cost_rows, forecast_rows), encoding="utf-8")
+            files.append(path.name)
+        if "xlsx" in formats:
+            path = output_dir / f"{name}.xlsx"
+            write_xlsx(path, customer, period, cost_rows, forecast_rows)
+            files.append(path.name)
+        results.append((customer, total_micros(costs[positions]), total_micros(forecast_costs[positions]), files))
+    return results
+
+
+# Split the customer list into batches of whole customers
+def customer_batches(contracts, batch_customers=DEFAULT_BATCH_CUSTOMERS):
+    codes, _ = pd.factorize(contracts[CONTRACT_COLUMN])
+    batch_ids = codes // batch_customers
+    return [batch.reset_index(drop=True) for _, batch in contracts.groupby(batch_ids, sort=True)]
+
+
+# Render the reports of every customer in a worker pool. index.csv lists every customer with its
+# totals and files; it is appended as batches finish, so a long run can be followed on disk.
+def run(input_path, output_dir, formats=("html",), workers=None, batch_customers=DEFAULT_BATCH_CUSTOMERS,
+        period=None, template_path=DEFAULT_TEMPLATE, log=sys.stderr):
+    workers = workers or os.cpu_count() or 1
+    period = period or datetime.now().strftime("%Y-%m")
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    started = time.perf_counter()
+    contracts = read_contracts(input_path)
+    customers = contracts[CONTRACT_COLUMN].nunique()
+    batches = customer_batches(contracts, batch_customers)
+    reports = 0
+
+    with open(output_dir / "index.csv", "w", newline="", encoding="utf-8") as index_file, \
+            ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(template_path,)) as pool:
+        index = csv.writer(index_file)
+        index.writerow([CONTRACT_COLUMN, "total_cost", "planned_cost", "files"])
+        futures = [pool.submit(render_batch, batch, output_dir, formats, period) for batch in batches]
+        for future in as_completed(futures):
+            results = future.result()
+            for customer, cost, planned_cost, files in results:
+                index.writerow([customer, format_money(cost, separator=""), format_money(planned_cost, separator=""), " ".join(files)])
+            index_file.flush()
+            reports += len(results)
+            print(f"{reports:,} / {customers:,} customers", file=log)
+
+    elapsed = time.perf_counter() - started
+    print(f"rendered {reports:,} customers in {elapsed:.3f}s ({reports / max(elapsed, 1e-9):,.0f} customers/s)", file=log)
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render Tab 3 / Tab 4 cost reports for a list of customers.")
+    parser.add_argument("input", help="CSV or Parquet with contract_id, metric, spend, limit[, unit_cost][, planned]")
+    parser.add_argument("--output-dir", required=True, help="directory for the reports and index.csv")
+    parser.add_argument("--formats", nargs="+", choices=REPORT_FORMATS, default=["html"], help="report formats")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_CUSTOMERS, help="customers per worker task")
+    parser.add_argument("--period", default=None, help="period shown in the reports (default: current month)")
+    parser.add_argument("--template", default=DEFAULT_TEMPLATE, help="HTML report template")
+    args = parser.parse_args()
+
+    run(
+        args.input, args.output_dir, formats=args.formats, workers=args.workers, batch_customers=args.batch_size,
+        period=args.period, template_path=args.template,
+    )
+
+
+if __name__ == "__main__":
+    main()
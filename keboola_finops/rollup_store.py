@@ -0,0 +1,175 @@
+import argparse
+import sqlite3
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from .pricing_rules import rules
+from .usage_loader import DATE_COLUMN, METRIC_COLUMN, VALUE_COLUMN, is_level_metric, load_daily_usage
+
+PERIODS = ("month", "quarter", "year")
+PERIOD_MONTHS = {"month": 1, "quarter": 3, "year": 12}
+
+# Contracted yearly limits that are not simply twelve monthly limits (pricing rules config)
+YEARLY_LIMITS = rules.yearly_limits
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS daily_usage (
+    metric TEXT NOT NULL,
+    day TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (metric, day)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS rollups (
+    period TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (period, bucket, metric)
+) WITHOUT ROWID;
+"""
+
+
+# Bucket label of a day: 2025-03 (month), 2025-Q1 (quarter), 2025 (year)
+def bucket_of(day, period):
+    if period == "month":
+        return f"{day.year}-{day.month:02d}"
+    if period == "quarter":
+        return f"{day.year}-Q{(day.month - 1) // 3 + 1}"
+    if period == "year":
+        return f"{day.year}"
+    raise ValueError(f"Unknown period: {period}")
+
+
+# Half-open [start, end) range of ISO days covered by a bucket
+def bucket_range(bucket, period):
+    year = int(bucket[:4])
+    if period == "month":
+        first_month = int(bucket[5:7])
+    elif period == "quarter":
+        first_month = (int(bucket[-1]) - 1) * 3 + 1
+    else:
+        first_month = 1
+    last_month = first_month + PERIOD_MONTHS[period]
+    start = date(year, first_month, 1)
+    end = date(year + (last_month - 1) // 12, (last_month - 1) % 12 + 1, 1)
+    return start.isoformat(), end.isoformat()
+
+
+# Limits for a period derived from the monthly limits
+def period_limits(metrics, monthly_limits, period):
+    metrics = np.asarray(metrics, dtype=object)
+    limits = np.asarray(monthly_limits)
+    if period == "month":
+        return limits
+    level = np.array([is_level_metric(m) for m in metrics], dtype=bool)
+    scaled = np.where(level, limits, limits * PERIOD_MONTHS[period])
+    if period == "year":
+        overrides = np.array([YEARLY_LIMITS.get(m, -1) for m in metrics])
+        scaled = np.where(~level & (overrides >= 0), overrides, scaled)
+    return scaled
+
+
+# Fallback when there is no history: extrapolate one month of usage to a longer period
+def extrapolate_spend(metrics, monthly_spend, period):
+    spend = np.asarray(monthly_spend)
+    level = np.array([is_level_metric(m) for m in metrics], dtype=bool)
+    return np.where(level, spend, spend * PERIOD_MONTHS[period])
+
+
+# Embedded SQLite store of daily usage with precomputed month / quarter / year rollups.
+# Appending a batch of days only refreshes the buckets those days fall into.
+class RollupStore:
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    # Append daily aggregates (date / metric / value). Days already in the store are replaced,
+    # so re-ingesting the same export is idempotent.
+    def append(self, daily):
+        if daily.empty:
+            return
+        days = pd.to_datetime(daily[DATE_COLUMN]).dt.date
+        rows = list(zip(daily[METRIC_COLUMN].astype(str), (d.isoformat() for d in days), daily[VALUE_COLUMN].astype(float)))
+        affected = {
+            (period, bucket_of(day, period), metric)
+            for metric, day in set(zip(daily[METRIC_COLUMN].astype(str), days))
+            for period in PERIODS
+        }
+
+        with self.connection:
+            self.connection.executemany("INSERT OR REPLACE INTO daily_usage (metric, day, value) VALUES (?, ?, ?)", rows)
+            for period, bucket, metric in sorted(affected):
+                self._refresh(period, bucket, metric)
+
+    def _refresh(self, period, bucket, metric):
+        start, end = bucket_range(bucket, period)
+        if is_level_metric(metric):
+            # Levels roll up to the value of the most recent day in the bucket
+            query = "SELECT value FROM daily_usage WHERE metric = ? AND day >= ? AND day < ? ORDER BY day DESC LIMIT 1"
+        else:
+            query = "SELECT SUM(value) FROM daily_usage WHERE metric = ? AND day >= ? AND day < ?"
+        (value,) = self.connection.execute(query, (metric, start, end)).fetchone() or (None,)
+        self.connection.execute(
+            "INSERT OR REPLACE INTO rollups (period, bucket, metric, value) VALUES (?, ?, ?, ?)",
+            (period, bucket, metric, value or 0.0),
+        )
+
+    # Stream an export file into the store
+    def ingest(self, path, **kwargs):
+        self.append(load_daily_usage(path, **kwargs))
+
+    def buckets(self, period):
+        rows = self.connection.execute("SELECT DISTINCT bucket FROM rollups WHERE period = ? ORDER BY bucket", (period,))
+        return [bucket for (bucket,) in rows]
+
+    # {metric: value} for one bucket, the most recent one by default
+    def read(self, period, bucket=None):
+        if bucket is None:
+            (bucket,) = self.connection.execute("SELECT MAX(bucket) FROM rollups WHERE period = ?", (period,)).fetchone()
+        rows = self.connection.execute(
+            "SELECT metric, value FROM rollups WHERE period = ? AND bucket = ?", (period, bucket)
+        )
+        return dict(rows.fetchall())
+
+    # First and last stored day (ISO strings), (None, None) when the store is empty
+    def day_range(self):
+        return self.connection.execute("SELECT MIN(day), MAX(day) FROM daily_usage").fetchone()
+
+    # All buckets of a period as a bucket x metric frame, oldest first. complete=True keeps only the
+    # buckets the stored days cover from start to end - the current month (or a history starting
+    # mid-month) is a partial sum and would count as a low whole-period sample.
+    def history(self, period="month", complete=False):
+        rows = self.connection.execute(
+            "SELECT bucket, metric, value FROM rollups WHERE period = ? ORDER BY bucket", (period,)
+        )
+        frame = pd.DataFrame(rows.fetchall(), columns=["bucket", "metric", "value"])
+        history = frame.pivot(index="bucket", columns="metric", values="value").fillna(0)
+        if complete and not history.empty:
+            first_day, last_day = self.day_range()
+            end = (date.fromisoformat(last_day) + timedelta(days=1)).isoformat()
+            ranges = [bucket_range(bucket, period) for bucket in history.index]
+            history = history[[start >= first_day and stop <= end for start, stop in ranges]]
+        return history
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Append Keboola usage exports to the rollup store.")
+    parser.add_argument("exports", nargs="+", help="CSV or Parquet usage exports")
+    parser.add_argument("--db", required=True, help="SQLite rollup store")
+    args = parser.parse_args()
+
+    store = RollupStore(args.db)
+    for path in args.exports:
+        store.ingest(path)
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
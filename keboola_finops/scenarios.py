@@ -0,0 +1,77 @@
+import numpy as np
+
+from .cost_engine import tier_tables
+from .tiers import WHOLE_VOLUME
+
+# Points sent to the chart - the grid itself can be much larger
+MAX_PLOT_POINTS = 2000
+
+
+# Planned cost of buying each volume (Tab 4 rules): tiered metrics price the whole volume
+# at the band price (or band by band with mode=GRADUATED), the others use the unit cost
+def forecast_costs(metric, volumes, unit_costs, mode=WHOLE_VOLUME):
+    volumes = np.asarray(volumes, dtype=float)
+    if metric in tier_tables:
+        return tier_tables[metric].cost(volumes, mode)
+    return volumes * unit_costs.get(metric, 0)
+
+
+def forecast_unit_prices(metric, volumes, unit_costs):
+    volumes = np.asarray(volumes, dtype=float)
+    if metric in tier_tables:
+        return tier_tables[metric].price(volumes)
+    return np.full(volumes.shape, unit_costs.get(metric, 0), dtype=float)
+
+
+# Volumes where the unit price changes - the first volume of every band after the first
+def tier_breakpoints(metric):
+    if metric not in tier_tables:
+        return np.array([], dtype=float)
+    table = tier_tables[metric]
+    return table.lower_bounds[1:]
+
+
+# Cheapest way to cover each volume: buy exactly that volume, or buy up to the start of a
+# higher band whose lower unit price makes the larger purchase cheaper.
+# Returns (volume to buy, cost) arrays.
+def cheapest_purchase(metric, volumes, unit_costs):
+    volumes = np.asarray(volumes, dtype=float)
+    best_volume = volumes.copy()
+    best_cost = forecast_costs(metric, volumes, unit_costs)
+    for breakpoint in tier_breakpoints(metric):
+        breakpoint_cost = float(forecast_costs(metric, breakpoint, unit_costs))
+        cheaper = (volumes < breakpoint) & (breakpoint_cost < best_cost)
+        best_volume[cheaper] = breakpoint
+        best_cost[cheaper] = breakpoint_cost
+    return best_volume, best_cost
+
+
+# Evaluate a whole grid of forecast volumes in one batched computation
+def sweep(metric, max_volume, points, unit_costs):
+    import pandas as pd
+
+    volumes = np.linspace(0, max_volume, int(points))
+    costs = forecast_costs(metric, volumes, unit_costs)
+    buy_volumes, buy_costs = cheapest_purchase(metric, volumes, unit_costs)
+    return pd.DataFrame({
+        "volume": volumes,
+        "unit_price": forecast_unit_prices(metric, volumes, unit_costs),
+        "cost": costs,
+        "marginal_cost": np.gradient(costs, volumes) if len(volumes) > 1 else np.zeros_like(costs),
+        "cheapest_volume": buy_volumes,
+        "cheapest_cost": buy_costs,
+    })
+
+
+# Thin a sweep out for plotting while keeping the rows around every breakpoint,
+# so the jumps in the curve stay visible
+def plot_points(curve, breakpoints, max_points=MAX_PLOT_POINTS):
+    if len(curve) <= max_points:
+        return curve
+    volumes = curve["volume"].to_numpy()
+    keep = np.zeros(len(curve), dtype=bool)
+    keep[:: int(np.ceil(len(curve) / max_points))] = True
+    keep[-1] = True
+    around = np.searchsorted(volumes, breakpoints)
+    keep[np.clip(np.concatenate([around - 1, around]), 0, len(curve) - 1)] = True
+    return curve[keep]
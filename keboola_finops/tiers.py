@@ -0,0 +1,67 @@
+from functools import lru_cache
+
+import numpy as np
+
+# Pricing modes for TierTable.cost
+WHOLE_VOLUME = "volume"  # the whole volume is priced at the price of the band it falls into
+GRADUATED = "graduated"  # each band only prices the part of the volume inside it
+
+
+# Tier table compiled once from a {(min_vol, max_vol): {'discount': ..., 'price': ...}} dict.
+# Bands are closed on the upper bound, so a volume above one band's max belongs to the next
+# band (5.5 projects fall into 6-10, not back into the last tier).
+class TierTable:
+    def __init__(self, pricing_table):
+        bands = sorted(pricing_table.items())
+        self.lower_bounds = np.array([min_vol for (min_vol, _), _ in bands], dtype=float)
+        self.upper_bounds = np.array([max_vol for (_, max_vol), _ in bands], dtype=float)
+        self.prices = np.array([rates['price'] for _, rates in bands], dtype=float)
+        self.discounts = np.array([rates.get('discount', 0.0) for _, rates in bands], dtype=float)
+
+        # Band edges without the integer gaps: band i covers (edges[i], edges[i + 1]]
+        self.edges = np.concatenate([self.lower_bounds[:1], self.upper_bounds])
+        # Graduated cost of filling every band below band i completely
+        widths = np.diff(self.edges[:-1])
+        self.cumulative_costs = np.concatenate([[0.0], np.cumsum(widths * self.prices[:-1])])
+
+    def __len__(self):
+        return len(self.prices)
+
+    # Index of the band each volume falls into
+    def band_index(self, volumes):
+        index = np.searchsorted(self.upper_bounds, volumes, side="left")
+        return np.minimum(index, len(self.prices) - 1)
+
+    # Unit price for a scalar or an array of volumes
+    def price(self, volumes):
+        prices = self.prices[self.band_index(volumes)]
+        return prices if np.ndim(prices) else float(prices)
+
+    # Total cost for a scalar or an array of volumes
+    def cost(self, volumes, mode=WHOLE_VOLUME):
+        volumes = np.asarray(volumes, dtype=float)
+        index = self.band_index(volumes)
+        if mode == WHOLE_VOLUME:
+            costs = volumes * self.prices[index]
+        elif mode == GRADUATED:
+            filled = np.maximum(volumes - self.edges[index], 0.0)
+            costs = self.cumulative_costs[index] + filled * self.prices[index]
+        else:
+            raise ValueError(f"Unknown pricing mode: {mode}")
+        return costs if np.ndim(costs) else float(costs)
+
+
+# Compiled table of a raw pricing dict, keyed by its bands, prices and discounts
+@lru_cache(maxsize=64)
+def _compile(bands):
+    return TierTable({band: {"price": price, "discount": discount} for band, price, discount in bands})
+
+
+# TierTable of a compiled table or a raw pricing dict. Each distinct dict is compiled once, so
+# callers that still pass dicts do not rebuild the table on every lookup.
+def tier_table_of(pricing_table):
+    if isinstance(pricing_table, TierTable):
+        return pricing_table
+    return _compile(tuple(
+        (band, rates["price"], rates.get("discount", 0.0)) for band, rates in pricing_table.items()
+    ))
@@ -0,0 +1,158 @@
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import nullcontext
+
+# Timing is switched on with KEBOOLA_TIMING=1 or the ?timing=1 query parameter
+TIMING_ENV = "KEBOOLA_TIMING"
+TIMING_PARAM = "timing"
+
+# Spans of older reruns are dropped, so a long session does not grow without bound
+MAX_RERUNS = 50
+
+# Shared no-op span handed out while timing is off
+_DISABLED = nullcontext()
+
+
+def timing_enabled(query_params=None):
+    if os.environ.get(TIMING_ENV, "") not in ("", "0"):
+        return True
+    return query_params is not None and query_params.get(TIMING_PARAM, "") not in ("", "0")
+
+
+class _Span:
+    def __init__(self, tracer, name):
+        self.tracer = tracer
+        self.name = name
+
+    def __enter__(self):
+        self.depth = len(self.tracer.stack)
+        self.tracer.stack.append(self.name)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        duration = time.perf_counter() - self.start
+        self.tracer.stack.pop()
+        self.tracer.spans.append({
+            "name": self.name,
+            "rerun": self.tracer.rerun_id,
+            "start": self.start - self.tracer.origin,
+            "duration": duration,
+            "depth": self.depth,
+            "thread": threading.get_ident(),
+        })
+
+
+# Records nested timing spans per rerun. Disabled tracers hand out a shared no-op span, so the
+# instrumentation costs one method call per section.
+class Tracer:
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.origin = time.perf_counter()
+        self.spans = []
+        self.stack = []
+        self.rerun_id = 0
+        self.rerun_labels = {}
+        self.open_rerun = None
+
+    def span(self, name):
+        if not self.enabled:
+            return _DISABLED
+        return _Span(self, name)
+
+    # Full script run: everything until end_rerun() is one rerun
+    def begin_rerun(self, label="app"):
+        if not self.enabled:
+            return
+        self.end_rerun()
+        self.rerun_id += 1
+        self.rerun_labels[self.rerun_id] = label
+        self.spans = [span for span in self.spans if span["rerun"] > self.rerun_id - MAX_RERUNS]
+        self.stack = []
+        self.open_rerun = _Span(self, label).__enter__()
+
+    def end_rerun(self):
+        if self.open_rerun is not None:
+            self.open_rerun.__exit__(None, None, None)
+            self.open_rerun = None
+
+    # Fragment body: a span inside a full run, its own rerun when the fragment reruns alone
+    def fragment(self, label):
+        if not self.enabled:
+            return _DISABLED
+        if self.open_rerun is not None:
+            return self.span(label)
+        return _FragmentRerun(self, label)
+
+    # Decorator form of fragment() for the tab render functions
+    def traced(self, label):
+        def decorate(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.fragment(label):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    # Spans of one rerun (the last one by default)
+    def rerun_spans(self, rerun_id=None):
+        rerun_id = self.rerun_id if rerun_id is None else rerun_id
+        return [span for span in self.spans if span["rerun"] == rerun_id]
+
+    # Timing breakdown of a rerun: sections in call order, indented by nesting
+    def breakdown(self, rerun_id=None):
+        import pandas as pd
+
+        spans = sorted(self.rerun_spans(rerun_id), key=lambda span: span["start"])
+        if not spans:
+            return pd.DataFrame(columns=["Sekce", "ms", "%"])
+        total = max(span["duration"] for span in spans)
+        return pd.DataFrame({
+            "Sekce": ["· " * span["depth"] + span["name"] for span in spans],
+            "ms": [round(span["duration"] * 1000, 2) for span in spans],
+            "%": [round(span["duration"] / total * 100, 1) if total else 0.0 for span in spans],
+        })
+
+    # Total time of every recorded rerun, newest first
+    def rerun_totals(self):
+        import pandas as pd
+
+        totals = {span["rerun"]: span["duration"] for span in self.spans if span["depth"] == 0}
+        return pd.DataFrame({
+            "Běh": [f"{rerun_id}: {self.rerun_labels.get(rerun_id, '')}" for rerun_id in sorted(totals, reverse=True)],
+            "ms": [round(totals[rerun_id] * 1000, 2) for rerun_id in sorted(totals, reverse=True)],
+        })
+
+    # Complete events in the Chrome trace format (chrome://tracing, Perfetto)
+    def chrome_trace(self):
+        pid = os.getpid()
+        events = [
+            {
+                "name": span["name"],
+                "cat": self.rerun_labels.get(span["rerun"], ""),
+                "ph": "X",
+                "ts": span["start"] * 1e6,
+                "dur": span["duration"] * 1e6,
+                "pid": pid,
+                "tid": span["thread"],
+                "args": {"rerun": span["rerun"]},
+            }
+            for span in list(self.spans)
+        ]
+        return json.dumps({"traceEvents": events, "displayTimeUnit": "ms"})
+
+
+class _FragmentRerun:
+    def __init__(self, tracer, label):
+        self.tracer = tracer
+        self.label = label
+
+    def __enter__(self):
+        self.tracer.begin_rerun(f"fragment: {self.label}")
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.end_rerun()
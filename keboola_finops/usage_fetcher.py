@@ -0,0 +1,261 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# JSON file describing where each metric is fetched from (see usage_sources.example.json)
+SOURCES_ENV = "KEBOOLA_USAGE_SOURCES"
+
+SOURCE_KINDS = ("json", "snowflake")
+
+DEFAULT_POOL_SIZE = 10    # pooled connections shared by all endpoints
+DEFAULT_TIMEOUT = 30.0    # seconds per endpoint
+DEFAULT_MAX_AGE = 300.0   # seconds a snapshot is served before a background refresh starts
+
+SNOWFLAKE_STATEMENTS_PATH = "/api/v2/statements"
+SNOWFLAKE_POLL_INTERVAL = 0.5
+
+
+# Load and check the source config. Header values and tokens may reference environment
+# variables ("$KEBOOLA_MANAGE_TOKEN"), so the file itself holds no secrets.
+def load_sources(path):
+    with open(path, encoding="utf-8") as f:
+        sources = json.load(f)
+    errors = []
+    for metric, source in sources.get("metrics", {}).items():
+        if source.get("kind") not in SOURCE_KINDS:
+            errors.append(f"metric {metric!r}: kind must be one of {', '.join(SOURCE_KINDS)}")
+        elif source["kind"] == "json" and not source.get("url"):
+            errors.append(f"metric {metric!r}: json sources need a url")
+        elif source["kind"] == "snowflake" and not (source.get("statement") and sources.get("snowflake", {}).get("account_url")):
+            errors.append(f"metric {metric!r}: snowflake sources need a statement and snowflake.account_url")
+    if errors:
+        raise ValueError(f"Invalid usage sources in {path}:\n" + "\n".join(f"- {e}" for e in errors))
+    return sources
+
+
+def _expand(values):
+    return {key: os.path.expandvars(str(value)) for key, value in (values or {}).items()}
+
+
+# Metric value from a JSON response: follow the dotted path, then count the list, sum a field
+# over it, or take the value itself
+def extract_value(payload, source):
+    value = payload
+    for key in filter(None, source.get("path", "").split(".")):
+        value = value[int(key)] if isinstance(value, list) else value[key]
+    if source.get("count"):
+        return len(value)
+    if "sum" in source:
+        return sum(float(item[source["sum"]]) for item in value)
+    return float(value)
+
+
+# Fetches every configured metric concurrently on a background event loop, over one pool of
+# keep-alive connections. snapshot() never waits: it returns the last values at once and starts a
+# refresh when they are stale (stale-while-revalidate). Each metric is stored as soon as its
+# endpoint answers, so a slow endpoint only delays its own metric; a failed metric keeps its
+# last good value.
+class UsageFetcher:
+    def __init__(self, sources, pool_size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT, max_age=DEFAULT_MAX_AGE):
+        self.sources = sources
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.max_age = max_age
+        self.values = {}
+        self.fetched_at = {}
+        self.errors = {}
+        self.refreshed_at = None
+        self._refresh_future = None
+        self._session = None
+        self._lock = threading.Lock()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="usage-fetcher", daemon=True)
+        self._thread.start()
+
+    @property
+    def refreshing(self):
+        return self._refresh_future is not None and not self._refresh_future.done()
+
+    def snapshot(self):
+        with self._lock:
+            stale = self.refreshed_at is None or time.time() - self.refreshed_at > self.max_age
+            values = dict(self.values)
+        if stale:
+            self.refresh()
+        return values
+
+    # Start a refresh unless one is running; returns its concurrent.futures.Future
+    def refresh(self):
+        with self._lock:
+            if not self.refreshing:
+                self._refresh_future = asyncio.run_coroutine_threadsafe(self._refresh(), self._loop)
+            return self._refresh_future
+
+    def close(self):
+        if self._session is not None:
+            asyncio.run_coroutine_threadsafe(self._session.close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+    async def _refresh(self):
+        if self._session is None:
+            import aiohttp
+
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        await asyncio.gather(*(
+            self._refresh_metric(metric, source) for metric, source in self.sources.get("metrics", {}).items()
+        ))
+        with self._lock:
+            self.refreshed_at = time.time()
+
+    async def _refresh_metric(self, metric, source):
+        try:
+            if source["kind"] == "snowflake":
+                value = await self._fetch_snowflake(source)
+            else:
+                value = await self._fetch_json(source)
+        except Exception as error:
+            with self._lock:
+                self.errors[metric] = f"{type(error).__name__}: {error}"
+            return
+        with self._lock:
+            self.values[metric] = value
+            self.fetched_at[metric] = time.time()
+            self.errors.pop(metric, None)
+
+    async def _fetch_json(self, source):
+        async with self._session.get(source["url"], headers=_expand(source.get("headers"))) as response:
+            response.raise_for_status()
+            return extract_value(await response.json(content_type=None), source)
+
+    # Snowflake SQL API: submit the statement, poll while it runs, read the first cell
+    async def _fetch_snowflake(self, source):
+        snowflake = self.sources["snowflake"]
+        url = snowflake["account_url"].rstrip("/") + SNOWFLAKE_STATEMENTS_PATH
+        headers = {
+            "Authorization": f"Bearer {os.path.expandvars(snowflake.get('token', ''))}",
+            "X-Snowflake-Authorization-Token-Type": snowflake.get("token_type", "OAUTH"),
+            "Accept": "application/json",
+        }
+        body = {"statement": source["statement"], "timeout": int(self.timeout)}
+        body.update(_expand({key: snowflake[key] for key in ("warehouse", "role", "database") if key in snowflake}))
+
+        async with self._session.post(url, json=body, headers=headers) as response:
+            response.raise_for_status()
+            payload = await response.json(content_type=None)
+            status = response.status
+        while status == 202:
+            await asyncio.sleep(SNOWFLAKE_POLL_INTERVAL)
+            async with self._session.get(f"{url}/{payload['statementHandle']}", headers=headers) as response:
+                response.raise_for_status()
+                payload = await response.json(content_type=None)
+                status = response.status
+        value = payload["data"][0][0]
+        return float(value) if value is not None else 0.0
+
+
+# One fetcher per sources file, shared by all sessions of the Streamlit process
+_fetchers = {}
+_fetchers_lock = threading.Lock()
+
+
+def shared_fetcher(path, **options):
+    key = str(Path(path).resolve())
+    with _fetchers_lock:
+        if key not in _fetchers:
+            _fetchers[key] = UsageFetcher(load_sources(path), **options)
+        return _fetchers[key]
+
+
+# Local stub of the Keboola and Snowflake endpoints for development. `routes` maps GET paths to
+# (delay in seconds, JSON payload); `statements` maps SQL text to (delay, first cell). Both are read
+# per request, so a test can change them between refreshes. The server counts the TCP connections
+# it accepted, which shows whether clients reuse pooled connections, and the requests it answered.
+def run_stub_server(routes, statements=None, port=0):
+    statements = statements or {}
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive
+
+        def setup(self):
+            super().setup()
+            self.server.connections += 1
+
+        def _reply(self, delay, payload):
+            time.sleep(delay)
+            body = json.dumps(payload).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            self.server.requests += 1
+            if self.path not in routes:
+                self.send_error(404)
+                return
+            self._reply(*routes[self.path])
+
+        def do_POST(self):
+            self.server.requests += 1
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            if self.path != SNOWFLAKE_STATEMENTS_PATH or request.get("statement") not in statements:
+                self.send_error(404)
+                return
+            delay, value = statements[request["statement"]]
+            self._reply(delay, {"data": [[str(value)]]})
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    server.daemon_threads = True
+    server.connections = 0
+    server.requests = 0
+    threading.Thread(target=server.serve_forever, name="usage-stub", daemon=True).start()
+    return server
+
+
+# Run the fetcher against the stub with one slow endpoint: the first snapshot returns at once,
+# fast metrics arrive before the slow one, and the second refresh reuses the pooled connections
+def demo_against_stub(slow_delay=1.0):
+    server = run_stub_server(
+        routes={
+            "/manage/organizations/1/projects": (0.05, [{"id": i} for i in range(150)]),
+            "/telemetry/ppu": (0.1, {"data": [{"value": 12000}, {"value": 8000}]}),
+        },
+        statements={"SELECT credits": (slow_delay, 3500), "SELECT storage": (0.05, 70)},
+    )
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    sources = {
+        "snowflake": {"account_url": base_url, "token": "stub"},
+        "metrics": {
+            "Počet projektů": {"kind": "json", "url": f"{base_url}/manage/organizations/1/projects", "count": True},
+            "PPU": {"kind": "json", "url": f"{base_url}/telemetry/ppu", "path": "data", "sum": "value"},
+            "Snowflake credits": {"kind": "snowflake", "statement": "SELECT credits"},
+            "Snowflake storage": {"kind": "snowflake", "statement": "SELECT storage"},
+        },
+    }
+    fetcher = UsageFetcher(sources)
+    started = time.perf_counter()
+    print(f"first snapshot after {(time.perf_counter() - started) * 1000:.1f} ms: {fetcher.snapshot()}")
+    time.sleep(slow_delay / 2)
+    print(f"after {time.perf_counter() - started:.2f} s: {fetcher.snapshot()}")
+    fetcher.refresh().result()
+    print(f"after {time.perf_counter() - started:.2f} s: {fetcher.snapshot()}")
+    fetcher.refresh().result()
+    print(f"two refreshes of {len(sources['metrics'])} endpoints used {server.connections} connections")
+    fetcher.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    demo_against_stub()
@@ -0,0 +1,152 @@
+import argparse
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .usage_loader import (
+    COMPONENT_COLUMN, CONFIGURATION_COLUMN, DATE_COLUMN, DEFAULT_CHUNKSIZE, METRIC_COLUMN, PROJECT_COLUMN,
+    USER_COLUMN, VALUE_COLUMN, iter_usage_chunks,
+)
+
+# Columns stored as dictionary codes - a handful of distinct names repeated on every row
+CATEGORY_COLUMNS = (METRIC_COLUMN, PROJECT_COLUMN, COMPONENT_COLUMN, CONFIGURATION_COLUMN, USER_COLUMN)
+
+HISTORY_SUFFIXES = (".feather", ".arrow")
+
+
+# Smallest integer type that holds the codes of `size` categories
+def code_type(size):
+    import pyarrow as pa
+
+    for arrow_type, max_code in ((pa.int8(), 2 ** 7), (pa.int16(), 2 ** 15), (pa.int32(), 2 ** 31)):
+        if size <= max_code:
+            return arrow_type
+    return pa.int64()
+
+
+# Narrowest type that holds every value exactly: the smallest integer type when all values are
+# whole numbers, float32 when it loses nothing, float64 otherwise
+def value_type(minimum, maximum, integral, float32_exact):
+    import pyarrow as pa
+
+    if integral:
+        for arrow_type, dtype in ((pa.int8(), np.int8), (pa.int16(), np.int16), (pa.int32(), np.int32)):
+            if np.iinfo(dtype).min <= minimum and maximum <= np.iinfo(dtype).max:
+                return arrow_type
+        return pa.int64()
+    return pa.float32() if float32_exact else pa.float64()
+
+
+# First pass over an export: the categories of every category column and the value range
+def scan_export(path, chunksize=DEFAULT_CHUNKSIZE, column_map=None):
+    categories = {}
+    minimum, maximum = np.inf, -np.inf
+    integral = float32_exact = True
+    for chunk in iter_usage_chunks(path, chunksize=chunksize, column_map=column_map):
+        for column in CATEGORY_COLUMNS:
+            if column in chunk:
+                categories.setdefault(column, set()).update(chunk[column].dropna().unique())
+        values = chunk[VALUE_COLUMN].to_numpy(dtype=float)
+        if len(values):
+            minimum, maximum = min(minimum, values.min()), max(maximum, values.max())
+            integral = integral and bool((values == np.round(values)).all())
+            float32_exact = float32_exact and bool((values.astype(np.float32) == values).all())
+    return (
+        {column: sorted(map(str, found)) for column, found in categories.items()},
+        value_type(minimum, maximum, integral, float32_exact),
+    )
+
+
+# One export chunk as an Arrow batch: dates as date32, names as codes into the shared dictionaries
+def compact_batch(chunk, schema, categories):
+    import pyarrow as pa
+
+    arrays = []
+    for field in schema:
+        column = chunk[field.name]
+        if field.name in categories:
+            dictionary = categories[field.name]
+            codes = pd.Categorical(column.astype(object), categories=dictionary).codes
+            arrays.append(pa.DictionaryArray.from_arrays(
+                pa.array(codes, type=field.type.index_type, mask=codes < 0), pa.array(dictionary, type=pa.string())
+            ))
+        elif field.name == DATE_COLUMN:
+            arrays.append(pa.array(column.dt.date, type=pa.date32(), from_pandas=True))
+        else:
+            arrays.append(pa.array(column.to_numpy(), type=field.type, from_pandas=True))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+# Convert a CSV / Parquet export into the compact history file. Two streaming passes: the first
+# fixes the dictionaries and the value type, the second writes the batches. The file is an
+# uncompressed Arrow IPC (Feather v2) file, so readers can memory-map it without decoding.
+def write_history(export_path, history_path, chunksize=DEFAULT_CHUNKSIZE, column_map=None):
+    import pyarrow as pa
+
+    categories, values = scan_export(export_path, chunksize=chunksize, column_map=column_map)
+    fields = [pa.field(DATE_COLUMN, pa.date32())]
+    fields += [pa.field(column, pa.dictionary(code_type(len(categories[column])), pa.string())) for column in categories]
+    fields.append(pa.field(VALUE_COLUMN, values))
+    schema = pa.schema(fields)
+
+    rows = 0
+    with pa.OSFile(str(history_path), "wb") as sink, pa.ipc.new_file(sink, schema) as writer:
+        for chunk in iter_usage_chunks(export_path, chunksize=chunksize, column_map=column_map):
+            writer.write_batch(compact_batch(chunk, schema, categories))
+            rows += len(chunk)
+    return rows
+
+
+def is_history_file(path):
+    return Path(path).suffix.lower() in HISTORY_SUFFIXES
+
+
+# Memory-mapped history tables, one per file and process. The columns point straight into the
+# mapping, so every session (and every process reading the same file) shares the OS page cache
+# instead of holding its own copy. A rewritten file (new mtime / size) is mapped again.
+_tables = {}
+_tables_lock = threading.Lock()
+
+
+def open_history(path):
+    import pyarrow as pa
+
+    path = Path(path).resolve()
+    stat = path.stat()
+    key = (str(path), stat.st_mtime_ns, stat.st_size)
+    with _tables_lock:
+        if key not in _tables:
+            for stale in [k for k in _tables if k[0] == key[0]]:
+                del _tables[stale]
+            _tables[key] = pa.ipc.open_file(pa.memory_map(str(path), "r")).read_all()
+        return _tables[key]
+
+
+# History as a pandas frame with categorical names and the stored numeric types. Only the
+# requested columns are converted; numeric columns without nulls are not copied.
+def history_frame(path, columns=None):
+    table = open_history(path)
+    if columns is not None:
+        table = table.select(columns)
+    return table.to_pandas(date_as_object=False, split_blocks=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a Keboola usage export into the compact history file.")
+    parser.add_argument("export", help="CSV or Parquet usage export")
+    parser.add_argument("--output", required=True, help="history file (.feather or .arrow)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="rows per batch")
+    args = parser.parse_args()
+
+    rows = write_history(args.export, args.output, chunksize=args.chunksize)
+    table = open_history(args.output)
+    print(f"wrote {rows:,} rows to {args.output} ({os.path.getsize(args.output) / 2 ** 20:,.1f} MB on disk)")
+    for field in table.schema:
+        print(f"  {field.name}: {field.type}")
+
+
+if __name__ == "__main__":
+    main()
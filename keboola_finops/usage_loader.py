@@ -0,0 +1,190 @@
+from pathlib import Path
+
+import pandas as pd
+
+from .pricing_rules import rules
+
+# Columns expected in a Keboola usage export (one row per project, day and metric)
+DATE_COLUMN = "date"
+PROJECT_COLUMN = "project_id"
+METRIC_COLUMN = "metric"
+VALUE_COLUMN = "value"
+COMPONENT_COLUMN = "component"  # optional - the Keboola component the usage is attributed to
+CONFIGURATION_COLUMN = "configuration_id"  # optional - the component configuration
+USER_COLUMN = "user"  # optional - the user or token that ran the job
+
+USAGE_DTYPES = {
+    PROJECT_COLUMN: "string",
+    METRIC_COLUMN: "category",
+    COMPONENT_COLUMN: "category",
+    CONFIGURATION_COLUMN: "category",
+    USER_COLUMN: "category",
+    VALUE_COLUMN: "float64",
+}
+
+# How each metric is aggregated over the export (pricing rules config) - unknown metrics are summed.
+# nunique counts distinct projects, latest takes the total of the most recent day (levels such as storage).
+METRIC_AGGREGATIONS = rules.aggregations
+
+# Aggregations of metrics that describe a level rather than a flow - they are not summed over time
+LEVEL_AGGREGATIONS = ("nunique", "latest")
+
+DEFAULT_CHUNKSIZE = 500_000
+
+
+def is_level_metric(metric, aggregations=None):
+    aggregations = METRIC_AGGREGATIONS if aggregations is None else aggregations
+    return aggregations.get(metric, "sum") in LEVEL_AGGREGATIONS
+
+
+# Read a CSV, Parquet or compact history (usage_history.py) export chunk by chunk, yielding typed DataFrames
+def iter_usage_chunks(path, chunksize=DEFAULT_CHUNKSIZE, column_map=None):
+    path = Path(path)
+    column_map = column_map or {}
+    columns = (DATE_COLUMN, PROJECT_COLUMN, METRIC_COLUMN, COMPONENT_COLUMN, CONFIGURATION_COLUMN, USER_COLUMN, VALUE_COLUMN)
+    source_columns = {column_map.get(c, c): c for c in columns}
+
+    if path.suffix.lower() in (".feather", ".arrow"):
+        # Batches straight from the memory-mapped history - already parsed, names stay categorical
+        from .usage_history import open_history
+
+        table = open_history(path)
+        table = table.select([c for c in columns if c in table.column_names])
+        for batch in table.to_batches(max_chunksize=chunksize):
+            yield batch.to_pandas(date_as_object=False)
+        return
+
+    if path.suffix.lower() in (".parquet", ".pq"):
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(path)
+        available = [c for c in source_columns if c in parquet_file.schema.names]
+        raw_chunks = (batch.to_pandas() for batch in parquet_file.iter_batches(batch_size=chunksize, columns=available))
+    else:
+        raw_chunks = pd.read_csv(
+            path,
+            chunksize=chunksize,
+            usecols=lambda c: c in source_columns,
+            dtype={c: "string" for c in source_columns},
+        )
+
+    for chunk in raw_chunks:
+        yield _parse_chunk(chunk.rename(columns=source_columns))
+
+
+def _parse_chunk(chunk):
+    if DATE_COLUMN in chunk:
+        chunk[DATE_COLUMN] = pd.to_datetime(chunk[DATE_COLUMN], errors="coerce")
+    chunk[VALUE_COLUMN] = pd.to_numeric(chunk[VALUE_COLUMN], errors="coerce").fillna(0)
+    chunk[METRIC_COLUMN] = chunk[METRIC_COLUMN].str.strip()
+    return chunk.astype({c: t for c, t in USAGE_DTYPES.items() if c in chunk})
+
+
+# Running per-metric aggregates - memory is bounded by the number of metrics, days and (for nunique) projects
+class UsageAggregator:
+    def __init__(self, aggregations=None):
+        self.aggregations = METRIC_AGGREGATIONS if aggregations is None else aggregations
+        self.sums = {}
+        self.daily = {}
+        self.distinct = {}
+
+    def add(self, chunk, since=None, until=None):
+        if since is not None:
+            chunk = chunk[chunk[DATE_COLUMN] >= pd.Timestamp(since)]
+        if until is not None:
+            chunk = chunk[chunk[DATE_COLUMN] < pd.Timestamp(until)]
+        if chunk.empty:
+            return
+
+        grouped = chunk.groupby(METRIC_COLUMN, observed=True)
+        for metric, value in grouped[VALUE_COLUMN].sum().items():
+            self.sums[metric] = self.sums.get(metric, 0.0) + value
+        latest_metrics = [m for m, how in self.aggregations.items() if how == "latest"]
+        if latest_metrics:
+            levels = chunk.loc[chunk[METRIC_COLUMN].isin(latest_metrics)]
+            for (metric, day), value in levels.groupby([METRIC_COLUMN, DATE_COLUMN], observed=True)[VALUE_COLUMN].sum().items():
+                days = self.daily.setdefault(metric, {})
+                days[day] = days.get(day, 0.0) + value
+
+        nunique_metrics = [m for m, how in self.aggregations.items() if how == "nunique"]
+        if nunique_metrics and PROJECT_COLUMN in chunk:
+            projects = chunk.loc[chunk[METRIC_COLUMN].isin(nunique_metrics), [METRIC_COLUMN, PROJECT_COLUMN]]
+            for metric, ids in projects.groupby(METRIC_COLUMN, observed=True)[PROJECT_COLUMN]:
+                self.distinct.setdefault(metric, set()).update(ids.dropna().unique())
+
+    def value(self, metric):
+        how = self.aggregations.get(metric, "sum")
+        if how == "nunique":
+            return len(self.distinct.get(metric, ()))
+        if how == "latest":
+            days = self.daily.get(metric)
+            return days[max(days)] if days else 0
+        return self.sums.get(metric, 0)
+
+    # Result in the Metric / Current Spend / Limit shape used by the tabs
+    def to_frame(self, limits):
+        return pd.DataFrame({
+            "Metric": list(limits),
+            "Current Spend": pd.to_numeric([self.value(metric) for metric in limits], downcast="integer"),
+            "Limit": list(limits.values()),
+        })
+
+
+# First day of the month of the latest date in a chunk, None when it has no dated rows
+def chunk_month_start(chunk):
+    latest = chunk[DATE_COLUMN].max()
+    if pd.isna(latest):
+        return None
+    return pd.Timestamp(latest.year, latest.month, 1)
+
+
+# First day of the latest month in an export, None when it has no dated rows. Exports are not
+# sorted, so this is a full pass over the file.
+def latest_month_start(path, chunksize=DEFAULT_CHUNKSIZE, column_map=None):
+    starts = [chunk_month_start(chunk) for chunk in iter_usage_chunks(path, chunksize, column_map)]
+    return max((start for start in starts if start is not None), default=None)
+
+
+# Stream an export into the Metric / Current Spend / Limit frame. `limits` maps metric -> limit
+# and fixes the metric order; metrics missing from the export get zero spend. Without `since` /
+# `until` the whole file is aggregated. latest_month=True aggregates only the latest month of
+# the export (what monthly limits compare with) in the same single pass: the running aggregate
+# starts over whenever a chunk reaches a later month.
+def load_usage(path, limits, chunksize=DEFAULT_CHUNKSIZE, since=None, until=None, column_map=None, latest_month=False):
+    aggregator = UsageAggregator()
+    month_start = None
+    for chunk in iter_usage_chunks(path, chunksize=chunksize, column_map=column_map):
+        if latest_month:
+            chunk_start = chunk_month_start(chunk)
+            if chunk_start is not None and (month_start is None or chunk_start > month_start):
+                month_start = chunk_start
+                aggregator = UsageAggregator()
+            since = month_start
+        aggregator.add(chunk, since=since, until=until)
+    return aggregator.to_frame(limits)
+
+
+# Stream an export into per-day, per-metric totals (date / metric / value). Flows and levels are
+# summed over projects, project counts are distinct per day. Memory is bounded by days x metrics.
+def load_daily_usage(path, chunksize=DEFAULT_CHUNKSIZE, column_map=None, aggregations=None):
+    aggregations = METRIC_AGGREGATIONS if aggregations is None else aggregations
+    nunique_metrics = [m for m, how in aggregations.items() if how == "nunique"]
+    sums = {}
+    distinct = {}
+
+    for chunk in iter_usage_chunks(path, chunksize=chunksize, column_map=column_map):
+        chunk = chunk.dropna(subset=[DATE_COLUMN])
+        chunk[DATE_COLUMN] = chunk[DATE_COLUMN].dt.normalize()
+        counted = chunk[METRIC_COLUMN].isin(nunique_metrics)
+
+        summed = chunk[~counted].groupby([DATE_COLUMN, METRIC_COLUMN], observed=True)[VALUE_COLUMN].sum()
+        for key, value in summed.items():
+            sums[key] = sums.get(key, 0.0) + value
+        if PROJECT_COLUMN in chunk:
+            for key, ids in chunk[counted].groupby([DATE_COLUMN, METRIC_COLUMN], observed=True)[PROJECT_COLUMN]:
+                distinct.setdefault(key, set()).update(ids.dropna().unique())
+
+    rows = [(day, metric, value) for (day, metric), value in sums.items()]
+    rows += [(day, metric, len(ids)) for (day, metric), ids in distinct.items()]
+    daily = pd.DataFrame(rows, columns=[DATE_COLUMN, METRIC_COLUMN, VALUE_COLUMN])
+    return daily.sort_values([DATE_COLUMN, METRIC_COLUMN], ignore_index=True)
@@ -1,7 +1,33 @@
+import os
+import time
+
 import streamlit as st
 import pandas as pd
 from pathlib import Path
 
+from keboola_finops import cost_cache
+from keboola_finops.attribution_cube import ALL, DIMENSIONS, AttributionCube, attribute_cost
+from keboola_finops.breach_detector import replay_export
+from keboola_finops.cost_engine import compute_cost_micros, default_unit_costs, explain_cost, get_price, line_cost_micros, tier_tables
+from keboola_finops.rollup_store import RollupStore, extrapolate_spend, period_limits
+from keboola_finops.forecaster import TrendForecaster
+from keboola_finops.limit_optimizer import lognormal_points, optimize_limits
+from keboola_finops.metric_grid import (
+    BATCHED_THRESHOLD, GRID_CSS, consumption_grid_html, cost_grid_html, page_count, page_slice
+)
+from keboola_finops.money import format_money, format_money_column, format_quantity, total_micros
+from keboola_finops.monte_carlo import history_stats, simulate
+from keboola_finops.pricing_rules import FIXED, rules
+from keboola_finops.scenarios import cheapest_purchase, forecast_costs, plot_points, sweep, tier_breakpoints
+from keboola_finops.timing import Tracer, timing_enabled
+from keboola_finops.usage_fetcher import SOURCES_ENV, shared_fetcher
+from keboola_finops.usage_loader import load_usage
+
+# Per-rerun section timings, kept in session state so fragment reruns are recorded too
+tracer = st.session_state.setdefault("timing_tracer", Tracer())
+tracer.enabled = timing_enabled(st.query_params)
+tracer.begin_rerun()
+
 # Sample data - replace with your actual data source
 data = {
     "Metric": [
@@ -16,8 +42,50 @@ data = {
     "Limit": [130, 28000, 13043, 15, 4167, 100]  # Example limits
 }
 
-# Convert to DataFrame
-df = pd.DataFrame(data)
+# One rollup store per database for the whole process: its SQLite connection is opened and the schema
+# checked once, not on every rerun of every session
+@st.cache_resource(show_spinner=False)
+def open_rollup_store(path):
+    return RollupStore(path)
+
+# Attribution cube on the shared rollup store, created (and its schema checked) once as well
+@st.cache_resource(show_spinner=False)
+def open_attribution_cube(path):
+    return AttributionCube(open_rollup_store(path))
+
+with tracer.span("Načtení dat (df)"):
+    # Load real usage from a Keboola export (CSV/Parquet) when one is configured. Limits are
+    # monthly, so only the latest month of the export is aggregated.
+    usage_export = os.environ.get("KEBOOLA_USAGE_EXPORT")
+    if usage_export:
+        limits = dict(zip(data["Metric"], data["Limit"]))
+        usage_df = cost_cache.results.get_or_compute(
+            ("usage", cost_cache.file_key(usage_export), tuple(limits.items())),
+            lambda: load_usage(usage_export, limits, latest_month=True),
+        )
+        data = {column: usage_df[column].tolist() for column in usage_df}
+    
+    # Live usage from the Keboola / Snowflake APIs when configured. The last snapshot is served at once
+    # while a background refresh runs, so the page never waits for the slowest endpoint.
+    usage_sources = os.environ.get(SOURCES_ENV)
+    if usage_sources:
+        usage_fetcher = shared_fetcher(usage_sources)
+        live_values = usage_fetcher.snapshot()
+        data = {**data, "Current Spend": [
+            int(value) if float(value).is_integer() else value
+            for value in (live_values.get(metric, spend) for metric, spend in zip(data["Metric"], data["Current Spend"]))
+        ]}
+    
+    # Convert to DataFrame
+    df = pd.DataFrame(data)
+    
+    # Daily usage history with month / quarter / year rollups, when one is configured
+    rollup_db = os.environ.get("KEBOOLA_ROLLUP_DB")
+    rollup_store = open_rollup_store(rollup_db) if rollup_db else None
+    rollup_key = cost_cache.file_key(rollup_db) if rollup_db else None
+    
+    # Content hash of the usage snapshot - every cached result below is keyed on it
+    usage_key = cost_cache.snapshot_key(df)
 
 # Set page config for a cleaner look
 st.set_page_config(
@@ -73,17 +141,62 @@ st.markdown("""
         color: #ff6b6b;
         font-weight: bold;
     }
-</style>
+""" + GRID_CSS + """</style>
 """, unsafe_allow_html=True)
 
 # Remove logo-related code and just keep the title
 st.markdown("# Keboola FinOps")
 
-# Create tabs
-tab1, tab2, tab3, tab4 = st.tabs(["Aktuální spotřeba", "Cena za jednotku", "Celkové náklady", "Plánování"])
+# Freshness of the live API data
+if usage_sources:
+    # Until the first refresh, metrics without an API value still show the export or sample data
+    fallback = "data z exportu" if usage_export else "ukázková data"
+    if usage_fetcher.refreshed_at is None and not live_values:
+        st.caption(f"Načítám aktuální data z API, do té doby se zobrazují {fallback}.")
+    elif usage_fetcher.refreshed_at is None:
+        st.caption(f"Načítám aktuální data z API, u metrik, které ještě nedorazily, se zobrazují {fallback}.")
+    else:
+        st.caption(f"Data z API aktualizována před {time.time() - usage_fetcher.refreshed_at:.0f} s.")
+    for metric, error in dict(usage_fetcher.errors).items():
+        st.warning(f"{metric}: nepodařilo se načíst aktuální data ({error})")
+
+# Streamlit drops the state of widgets that were not rendered in a run, which with lazy tabs is
+# every widget of a closed tab. Re-assigning the values keeps them until the tab is reopened.
+for key in [key for key in st.session_state if key != "active_tab"]:
+    st.session_state[key] = st.session_state[key]
+
+# Prices are shared through session state: Tab 2 edits them, Tabs 3 and 4 read them
+for metric in data["Metric"]:
+    st.session_state.setdefault(f"unit_{metric}", default_unit_costs.get(metric, 0.0))
+unit_costs = {metric: st.session_state[f"unit_{metric}"] for metric in data["Metric"]}
+
+# Overconsumption prices for selected metrics
+overconsumption_costs = rules.overconsumption_costs
+
+# Content hash of the price vector - cost results are keyed on it
+prices_key = cost_cache.price_key(unit_costs, overconsumption_costs, tier_tables)
+
+# Batched grid toggle and page selector shared by Tabs 1 and 3
+def batched_toggle(key):
+    st.session_state.setdefault(key, len(df) > BATCHED_THRESHOLD)
+    return st.toggle("Kompaktní zobrazení", key=key)
+
+def page_selector(rows, key):
+    pages = page_count(rows)
+    if pages == 1:
+        return 1
+    return st.number_input(f"Stránka (1-{pages})", min_value=1, max_value=pages, step=1, key=key)
+
+# Create tabs - only the open tab runs, switching tabs reruns the app
+tab1, tab2, tab3, tab4 = st.tabs(
+    ["Aktuální spotřeba", "Cena za jednotku", "Celkové náklady", "Plánování"], key="active_tab", on_change="rerun"
+)
 
 # Tab 1: Display the data with a nicer table
-with tab1:
+# Depends on the usage data only, so changing the period reruns just this fragment
+@st.fragment
+@tracer.traced("Tab 1: Aktuální spotřeba")
+def render_usage_tab():
     st.write("### Aktuální spotřeba")
     
     # Add explanation in a styled container
@@ -94,40 +207,78 @@ with tab1:
     """, unsafe_allow_html=True)
     
     # Add option to switch between monthly and yearly view
-    time_period = st.radio("Zobrazit:", ["Měsíční", "Roční"], horizontal=True)
-    
-    # Create a copy of the dataframe to modify based on selection
-    display_df = df.copy()
-    
-    # If yearly view is selected, adjust values appropriately
-    if time_period == "Roční":
-        for i, metric in enumerate(display_df["Metric"]):
-            # Don't multiply number of projects or Premium SLA
-            if metric not in ["Počet projektů", "Premimum SLA", "Snowflake storage"]:
-                # Multiply current spend by 12 for all metrics
-                display_df.at[i, "Current Spend"] = display_df.at[i, "Current Spend"] * 12
-                
-                # Set specific yearly limits for certain metrics
-                if metric == "PPU":
-                    display_df.at[i, "Limit"] = 336000
-                elif metric == "Snowflake credits":
-                    display_df.at[i, "Limit"] = 50004
-                elif metric == "CS Mds":
-                    display_df.at[i, "Limit"] = 180
-                else:
-                    # For other metrics, multiply limit by 12
-                    display_df.at[i, "Limit"] = display_df.at[i, "Limit"] * 12
+    time_period = st.radio("Zobrazit:", ["Měsíční", "Roční"], horizontal=True, key="time_period")
+    
+    # Build the view for the selected period - reused until the usage data or period changes
+    def build_period_view(df, time_period):
+        period = "year" if time_period == "Roční" else "month"
+        
+        with tracer.span("Měsíční / roční přepočet"):
+            # Create a copy of the dataframe to modify based on selection
+            display_df = df.copy()
+            
+            if rollup_store is not None:
+                # Read the real aggregates of the most recent month / year from the rollup store, rounded
+                # to two decimals - sums of fractional usage carry float noise. Metrics the store has never
+                # seen keep the loaded value (extrapolated for a year), so Tab 1 and Tab 3 price the same usage.
+                totals = rollup_store.read(period)
+                loaded = pd.Series(
+                    extrapolate_spend(display_df["Metric"], display_df["Current Spend"], period), index=display_df.index
+                )
+                display_df["Current Spend"] = pd.to_numeric(
+                    display_df["Metric"].map(totals).fillna(loaded).round(2), downcast="integer"
+                )
+            elif period == "year":
+                # Without history, extrapolate this month's usage (levels such as project count stay as they are)
+                display_df["Current Spend"] = extrapolate_spend(display_df["Metric"], display_df["Current Spend"], period)
+            display_df["Limit"] = period_limits(display_df["Metric"], display_df["Limit"], period)
+        
+        with tracer.span("Formátování čísel"):
+            # Format the dataframe for display
+            display_df_formatted = display_df.copy()
+            display_df_formatted["Current Spend"] = display_df_formatted["Current Spend"].apply(format_quantity)
+            display_df_formatted["Limit"] = display_df_formatted["Limit"].apply(format_quantity)
+        return display_df, display_df_formatted
     
-    # Format the dataframe for display
-    display_df_formatted = display_df.copy()
-    display_df_formatted["Current Spend"] = display_df_formatted["Current Spend"].apply(lambda x: f"{x:,}")
-    display_df_formatted["Limit"] = display_df_formatted["Limit"].apply(lambda x: f"{x:,}")
+    display_df, display_df_formatted = cost_cache.results.get_or_compute(
+        ("period_view", usage_key, rollup_key, time_period), lambda: build_period_view(df, time_period)
+    )
     
     # Display the table with better styling
-    st.table(display_df_formatted)
+    with tracer.span("Tabulka"):
+        st.table(display_df_formatted)
 
     # Plotting with better visuals
     st.write(f"### {time_period} spotřeba vs Limit")
+    render_usage_cards(display_df, limit_alerts(display_df))
+
+# Limit alerts per metric: the streaming breach detector over the latest month of the usage
+# export, otherwise the displayed spend compared with its limit
+@tracer.traced("Upozornění na limity")
+def limit_alerts(display_df):
+    if usage_export:
+        detector = cost_cache.results.get_or_compute(
+            ("breaches", cost_cache.file_key(usage_export), tuple(limits.items())),
+            lambda: replay_export(usage_export, limits),
+        )
+        return {
+            metric: [alert["message"] for alert in metric_alerts]
+            for metric, metric_alerts in detector.alerts_by_metric().items()
+        }
+    return {
+        metric: [f"Limit překročen: {format_quantity(spend)} / {format_quantity(limit)}"]
+        for metric, spend, limit in zip(display_df["Metric"], display_df["Current Spend"], display_df["Limit"])
+        if spend > limit and rules.kind(metric) != FIXED
+    }
+
+# Tab 1 consumption cards with progress bars
+@tracer.traced("Vykreslení karet")
+def render_usage_cards(display_df, alerts):
+    # Many metrics: one HTML block per page instead of a card and a progress bar per metric
+    if batched_toggle("usage_batched"):
+        page = page_selector(len(display_df), "usage_page")
+        st.markdown(consumption_grid_html(page_slice(display_df, page), alerts), unsafe_allow_html=True)
+        return
     
     # Create two columns for the progress bars
     col1, col2 = st.columns(2)
@@ -141,7 +292,7 @@ with tab1:
             st.markdown(f"""
             <div class="card">
                 <h4 style="color:#1f77b4;margin-bottom:10px;">{row['Metric']}</h4>
-                <p><b>Spotřeba:</b> {row['Current Spend']:,} / {row['Limit']:,} ({progress_value}%)</p>
+                <p><b>Spotřeba:</b> {format_quantity(row['Current Spend'])} / {format_quantity(row['Limit'])} ({progress_value}%)</p>
             </div>
             """, unsafe_allow_html=True)
             
@@ -149,12 +300,28 @@ with tab1:
             st.progress(100 if progress_value > 100 else progress_value)
             
             # Add warning if limit exceeded
-        
+            for message in alerts.get(row['Metric'], []):
+                st.markdown(f'<p class="warning">⚠ {message}</p>', unsafe_allow_html=True)
+
+# Tier table rows for display: band, discount and unit price
+def tier_display_rows(pricing_table):
+    bands = sorted(pricing_table.items())
+    price_format = "${:,.0f}" if all(float(rates['price']).is_integer() for _, rates in bands) else "${:,.2f}"
+    rows = []
+    for (min_vol, max_vol), rates in bands:
+        band = f"{min_vol:,} a více" if max_vol == float('inf') else f"{min_vol:,} - {max_vol:,}"
+        rows.append({
+            "Pásmo": band.replace(",", " "),
+            "Sleva": f"{rates['discount']:.0%}",
+            "Cena za jednotku": price_format.format(rates['price']),
+        })
+    return rows
 
 # Tab 2: Adjust Price Per Unit
-unit_costs = {}
-overconsumption_costs = {}  # New dictionary to store overconsumption prices
-with tab2:
+# Prices are written to session state; Tabs 3 and 4 pick them up when they are opened
+@st.fragment
+@tracer.traced("Tab 2: Cena za jednotku")
+def render_prices_tab():
     st.write("### Cena za jednotku")
     
     # Add explanation in a styled container
@@ -178,18 +345,7 @@ with tab2:
         basic_costs = {}
         for metric in data["Metric"]:
             # Set default values for basic price (without sales discount)
-            if metric == "Počet projektů":
-                default_value = 468.0  # Example: higher basic price before discount
-            elif metric == "PPU":
-                default_value = 0.94    # Example: higher basic price before discount
-            elif metric == "CS Mds":
-                default_value = 650.0  # Example: higher basic price before discount
-            elif metric == "Snowflake credits":
-                default_value = 5.0    # Example: higher basic price before discount
-            elif metric == "Snowflake storage":
-                default_value = 30.0   # Example: higher basic price before discount
-            else:
-                default_value = 0.0
+            st.session_state.setdefault(f"basic_{metric}", rules.basic_costs.get(metric, 0.0))
             
             # Add a number input for basic price in a card
             st.markdown(f"""
@@ -197,7 +353,7 @@ with tab2:
                 <h5>{metric}</h5>
             </div>
             """, unsafe_allow_html=True)
-            basic_price = st.number_input(f"Základní cena - {metric}", min_value=0.0, value=default_value, step=0.1, key=f"basic_{metric}")
+            basic_price = st.number_input(f"Základní cena - {metric}", min_value=0.0, step=0.1, key=f"basic_{metric}")
             basic_costs[metric] = basic_price
     
     # Discounted price column
@@ -209,28 +365,13 @@ with tab2:
         """, unsafe_allow_html=True)
         
         for metric in data["Metric"]:
-            # Set default values for price with sales discount (current prices)
-            if metric == "Počet projektů":
-                default_value = 377.0
-            elif metric == "PPU":
-                default_value = 0.75
-            elif metric == "CS Mds":
-                default_value = 500.0
-            elif metric == "Snowflake credits":
-                default_value = 4.0
-            elif metric == "Snowflake storage":
-                default_value = 23.0
-            else:
-                default_value = 0.0
-            
             # Add a number input for price with sales in a card
             st.markdown(f"""
             <div class="card" style="border-left-color:#59a14f;">
                 <h5>{metric}</h5>
             </div>
             """, unsafe_allow_html=True)
-            new_price = st.number_input(f"{metric}", min_value=0.0, value=default_value, step=0.1)
-            unit_costs[metric] = new_price
+            st.number_input(f"{metric}", min_value=0.0, step=0.1, key=f"unit_{metric}")
     
     # Add a divider
     st.markdown("---")
@@ -245,8 +386,8 @@ with tab2:
     
     # Create a dataframe for the overconsumption pricing table
     overconsumption_data = {
-        "Metrika": ["Počet projektů", "PPU"],
-        "Cena za nadspotřebu": [650.0, 1.3]
+        "Metrika": list(overconsumption_costs),
+        "Cena za nadspotřebu": list(overconsumption_costs.values())
     }
     
     # Convert to DataFrame
@@ -255,10 +396,6 @@ with tab2:
     # Display the table with better styling
     st.table(overconsumption_df)
     
-    # Store the overconsumption prices in the dictionary
-    overconsumption_costs["Počet projektů"] = 650.0
-    overconsumption_costs["PPU"] = 1.3
-    
     # Add another divider
     st.markdown("---")
     
@@ -269,64 +406,21 @@ with tab2:
     </div>
     """, unsafe_allow_html=True)
     
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        st.markdown("""
-        <div style="background-color:#4e79a7;color:white;padding:10px;border-radius:5px;margin-bottom:10px;text-align:center;">
-            <h4 style="margin:0;">KEBOOLA PROJECT</h4>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        df_project = pd.DataFrame([
-            {"Pásmo": "0-5", "Sleva": "0%", "Cena za jednotku": "$500"},
-            {"Pásmo": "6-10", "Sleva": "5%", "Cena za jednotku": "$475"},
-            {"Pásmo": "11-25", "Sleva": "10%", "Cena za jednotku": "$450"},
-            {"Pásmo": "26 a více", "Sleva": "15%", "Cena za jednotku": "$425"}
-        ])
-        st.table(df_project)
-
-    with col2:
-        st.markdown("""
-        <div style="background-color:#4e79a7;color:white;padding:10px;border-radius:5px;margin-bottom:10px;text-align:center;">
-            <h4 style="margin:0;">KEBOOLA PPU</h4>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        df_ppu = pd.DataFrame([
-            {"Pásmo": "až 2 000", "Sleva": "0%", "Cena za jednotku": "$1.00"},
-            {"Pásmo": "2 001 - 5 000", "Sleva": "5%", "Cena za jednotku": "$0.95"},
-            {"Pásmo": "5 001 - 10 000", "Sleva": "10%", "Cena za jednotku": "$0.90"},
-            {"Pásmo": "10 001 - 20 000", "Sleva": "15%", "Cena za jednotku": "$0.85"},
-            {"Pásmo": "20 001 a více", "Sleva": "20%", "Cena za jednotku": "$0.80"}
-        ])
-        st.table(df_ppu)
-
-# Function to calculate price based on volume (moved to global scope)
-def get_price(volume, pricing_table):
-    for (min_vol, max_vol), rates in pricing_table.items():
-        if min_vol <= volume <= max_vol:
-            return rates['price']
-    return pricing_table[max(pricing_table.keys())]['price']
-
-# Define pricing tables (moved to global scope)
-project_pricing = {
-    (0, 5): {'discount': 0.00, 'price': 500},
-    (6, 10): {'discount': 0.05, 'price': 475},
-    (11, 25): {'discount': 0.10, 'price': 450},
-    (26, float('inf')): {'discount': 0.15, 'price': 425}
-}
-
-ppu_pricing = {
-    (0, 2000): {'discount': 0.00, 'price': 1.00},
-    (2001, 5000): {'discount': 0.05, 'price': 0.95},
-    (5001, 10000): {'discount': 0.10, 'price': 0.90},
-    (10001, 20000): {'discount': 0.15, 'price': 0.85},
-    (20001, float('inf')): {'discount': 0.20, 'price': 0.80}
-}
+    # One table per tier table in the pricing rules
+    for col, (name, pricing_table) in zip(st.columns(len(rules.pricing_tables)), rules.pricing_tables.items()):
+        with col:
+            st.markdown(f"""
+            <div style="background-color:#4e79a7;color:white;padding:10px;border-radius:5px;margin-bottom:10px;text-align:center;">
+                <h4 style="margin:0;">KEBOOLA {name.upper()}</h4>
+            </div>
+            """, unsafe_allow_html=True)
+            
+            st.table(pd.DataFrame(tier_display_rows(pricing_table)))
 
 # Tab 3: Calculated Costs
-with tab3:
+# No widgets of its own - depends on the usage data and the prices from Tab 2
+@tracer.traced("Tab 3: Celkové náklady")
+def render_costs_tab():
     st.write("### Celkové náklady")
     
     # Create a container with a light background for the explanation
@@ -337,104 +431,68 @@ with tab3:
     </div>
     """, unsafe_allow_html=True)
     
-    # Function to calculate costs with appropriate pricing
-    def calculate_cost(metric, spend, limit, unit_cost):
-        if spend <= limit:
-            # Under limit - use regular pricing
-            cost = spend * unit_cost
-            details = f"{spend} × ${unit_cost:.2f} = ${cost:.2f}"
-            return cost, details
-        
-        # Over limit - handle differently based on metric
-        if metric == "Počet projektů":
-            # Use project pricing tiers
-            cost = calculate_cost_with_tiers(spend, limit, project_pricing)
-            in_limit = min(spend, limit)
-            over_limit = max(0, spend - limit)
-            in_limit_price = get_price(limit, project_pricing)
-            over_limit_price = get_price(over_limit, project_pricing)
-            
-            details = f"""
-            <span style="color:#0066cc">V limitu:</span> {in_limit} × ${in_limit_price:.2f} = ${in_limit * in_limit_price:.2f}<br>
-            <span style="color:#ff6b6b">Nad limit:</span> {over_limit} × ${over_limit_price:.2f} = ${over_limit * over_limit_price:.2f}<br>
-            <span style="font-weight:bold">Celkem: ${cost:.2f}</span>
-            """
-            return cost, details
-            
-        elif metric == "PPU":
-            # Use PPU pricing tiers
-            cost = calculate_cost_with_tiers(spend, limit, ppu_pricing)
-            in_limit = min(spend, limit)
-            over_limit = max(0, spend - limit)
-            in_limit_price = get_price(limit, ppu_pricing)
-            over_limit_price = get_price(over_limit, ppu_pricing)
-            
-            details = f"""
-            <span style="color:#0066cc">V limitu:</span> {in_limit} × ${in_limit_price:.2f} = ${in_limit * in_limit_price:.2f}<br>
-            <span style="color:#ff6b6b">Nad limit:</span> {over_limit} × ${over_limit_price:.2f} = ${over_limit * over_limit_price:.2f}<br>
-            <span style="font-weight:bold">Celkem: ${cost:.2f}</span>
-            """
-            return cost, details
-            
-        elif metric == "Premimum SLA":
-            # Premium SLA is a fixed price
-            cost = spend * unit_cost
-            details = f"Fixní cena: ${cost:.2f}"
-            return cost, details
-            
+    # Price all metrics in one vectorized pass, in exact micro-units
+    @tracer.traced("Výpočet nákladů")
+    def price_metrics(df, unit_costs):
+        unit_cost_column = df["Metric"].map(unit_costs).fillna(0).to_numpy()
+        in_limit_costs, over_limit_costs, calculated_costs = compute_cost_micros(
+            df["Metric"].to_numpy(), df["Current Spend"].to_numpy(), df["Limit"].to_numpy(), unit_cost_column
+        )
+        return pd.DataFrame({
+            "unit_cost": unit_cost_column,
+            "in_limit": in_limit_costs,
+            "over_limit": over_limit_costs,
+            "total": calculated_costs,
+        })
+    
+    # Reused across reruns until the usage data or one of the prices changes
+    priced = cost_cache.results.get_or_compute(
+        ("costs", usage_key, prices_key), lambda: price_metrics(df, unit_costs)
+    )
+    calculated_costs = priced["total"].to_numpy()
+    
+    # Many metrics: one HTML block per page instead of a card per metric
+    batched = batched_toggle("costs_batched")
+    if batched:
+        page = page_selector(len(df), "costs_page")
+        shown_df = page_slice(df, page)
+        shown_priced = page_slice(priced, page)
+    else:
+        shown_df = df
+        shown_priced = priced
+    
+    # Explanations are only built for the rows that are displayed, from the amounts priced above
+    with tracer.span("Vysvětlení výpočtu"):
+        cost_details = [
+            explain_cost(metric, current_spend, limit, unit_cost, costs)
+            for metric, current_spend, limit, unit_cost, *costs in zip(
+                shown_df["Metric"], shown_df["Current Spend"], shown_df["Limit"], shown_priced["unit_cost"],
+                shown_priced["in_limit"], shown_priced["over_limit"], shown_priced["total"],
+            )
+        ]
+    
+    with tracer.span("Vykreslení karet"):
+        if batched:
+            st.markdown(cost_grid_html(shown_df, cost_details), unsafe_allow_html=True)
         else:
-            # For other metrics, apply 30% premium on over-limit portion
-            in_limit = min(spend, limit)
-            over_limit = max(0, spend - limit)
-            in_limit_cost = in_limit * unit_cost
-            over_limit_cost = over_limit * (unit_cost * 1.3)
-            cost = in_limit_cost + over_limit_cost
-            
-            details = f"""
-            <span style="color:#0066cc">V limitu:</span> {in_limit} × ${unit_cost:.2f} = ${in_limit_cost:.2f}<br>
-            <span style="color:#ff6b6b">Nad limit:</span> {over_limit} × ${unit_cost * 1.3:.2f} (30% navýšení) = ${over_limit_cost:.2f}<br>
-            <span style="font-weight:bold">Celkem: ${cost:.2f}</span>
-            """
-            return cost, details
-    
-    # Helper function for tiered pricing calculation
-    def calculate_cost_with_tiers(spend, limit, pricing_table):
-        in_limit_cost = min(spend, limit) * get_price(limit, pricing_table)
-        if spend > limit:
-            over_limit = spend - limit
-            over_limit_cost = over_limit * get_price(over_limit, pricing_table)
-            return in_limit_cost + over_limit_cost
-        return in_limit_cost
-    
-    # Calculate costs for all metrics
-    calculated_costs = []
-    cost_details = []
-    
-    # Create columns for the metrics display
-    col1, col2 = st.columns(2)
-    
-    # Process each metric
-    for i, (index, row) in enumerate(df.iterrows()):
-        metric = row['Metric']
-        current_spend = row['Current Spend']
-        limit = row['Limit']
-        unit_cost = unit_costs.get(metric, 0)
-        
-        # Calculate cost and get details
-        cost, details = calculate_cost(metric, current_spend, limit, unit_cost)
-        calculated_costs.append(cost)
+            # Create columns for the metrics display
+            col1, col2 = st.columns(2)
         
-        # Display in alternating columns
-        with col1 if i % 2 == 0 else col2:
-            # Create a card-like container for each metric
-            st.markdown(f"""
-            <div class="card">
-                <h4 style="color:#1f77b4;margin-bottom:5px;">{metric}</h4>
-                <p><b>Aktuální spotřeba:</b> {current_spend:,}</p>
-                <p><b>Limit:</b> {limit:,}</p>
-                <p><b>Výpočet:</b><br>{details}</p>
-            </div>
-            """, unsafe_allow_html=True)
+            # Process each metric
+            for i, (metric, current_spend, limit, details) in enumerate(
+                zip(shown_df["Metric"], shown_df["Current Spend"], shown_df["Limit"], cost_details)
+            ):
+                # Display in alternating columns
+                with col1 if i % 2 == 0 else col2:
+                    # Create a card-like container for each metric
+                    st.markdown(f"""
+                    <div class="card">
+                        <h4 style="color:#1f77b4;margin-bottom:5px;">{metric}</h4>
+                        <p><b>Aktuální spotřeba:</b> {format_quantity(current_spend)}</p>
+                        <p><b>Limit:</b> {format_quantity(limit)}</p>
+                        <p><b>Výpočet:</b><br>{details}</p>
+                    </div>
+                    """, unsafe_allow_html=True)
     
     # Add a divider
     st.markdown("---")
@@ -442,29 +500,109 @@ with tab3:
     # Display the calculated costs in a table
     st.subheader("Souhrn nákladů")
     
-    # Create a DataFrame with all the cost information
-    calculated_df = pd.DataFrame({
-        "Metrika": data["Metric"],
-        "Aktuální spotřeba": [row['Current Spend'] for _, row in df.iterrows()],
-        "Limit": [row['Limit'] for _, row in df.iterrows()],
-        "Vypočítaná cena ($)": [f"{cost:,.2f}" for cost in calculated_costs]
-    })
-    
-    # Display the table
-    st.table(calculated_df)
+    with tracer.span("Souhrnná tabulka"):
+        # Create a DataFrame with all the cost information
+        calculated_df = pd.DataFrame({
+            "Metrika": data["Metric"],
+            "Aktuální spotřeba": df["Current Spend"].map(lambda x: format_quantity(x, separator="")),
+            "Limit": df["Limit"].map(lambda x: format_quantity(x, separator="")),
+            "Vypočítaná cena ($)": format_money_column(calculated_costs)
+        })
+        
+        # Display the table
+        st.table(calculated_df)
 
     # Calculate and display the total cost
-    total_cost = sum(calculated_costs)
+    total_cost = total_micros(calculated_costs)
     
     # Create a visually appealing total cost display
     st.markdown(f"""
     <div class="total-box">
-        <h2 style="margin:0;">Celkové náklady: ${total_cost:,.2f}</h2>
+        <h2 style="margin:0;">Celkové náklady: ${format_money(total_cost)}</h2>
     </div>
     """, unsafe_allow_html=True)
+    
+    if rollup_store is not None:
+        render_cost_attribution()
+
+DIMENSION_LABELS = {
+    "project_id": "Projekt",
+    "component": "Komponenta",
+    "configuration_id": "Konfigurace",
+    "user": "Uživatel",
+}
+
+# Tab 3 drill-down: a metric's monthly usage and cost split by project, component, configuration
+# and user. Every step reads one precomputed cuboid of the attribution cube, so the selections
+# rerun just this fragment and never group the raw usage again.
+@st.fragment
+@tracer.traced("Rozpad nákladů")
+def render_cost_attribution():
+    st.markdown("---")
+    st.subheader("Rozpad nákladů")
+    
+    cube = open_attribution_cube(rollup_db)
+    metrics = [metric for metric in cube.metrics() if metric in data["Metric"]]
+    if not metrics:
+        st.info("Úložiště zatím neobsahuje rozpad spotřeby (python -m keboola_finops.attribution_cube <export> --db <úložiště>).")
+        return
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        metric = st.selectbox("Metrika", metrics, key="attribution_metric")
+    with col2:
+        months = cube.months(metric)
+        # Default to the latest month through session state - the widget state is re-assigned on every
+        # rerun, which Streamlit does not allow together with an `index=` default
+        st.session_state.setdefault("attribution_month", months[-1])
+        month = st.selectbox("Měsíc", months, key="attribution_month")
+    with col3:
+        by = st.selectbox(
+            "Rozpad podle", DIMENSIONS, format_func=DIMENSION_LABELS.get, key="attribution_by"
+        )
+    
+    def lookup(*args):
+        return cost_cache.results.get_or_compute(
+            ("attribution", rollup_key, *args), lambda: cube.breakdown(*args[:3], dict(args[3]))
+        )
+    
+    # Filters on the other dimensions, each offering the values present in the slice chosen so far
+    filters = {}
+    filter_columns = st.columns(len(DIMENSIONS) - 1)
+    for column, dimension in zip(filter_columns, [d for d in DIMENSIONS if d != by]):
+        options = lookup(metric, month, dimension, tuple(filters.items()))[dimension].tolist()
+        with column:
+            value = st.selectbox(
+                DIMENSION_LABELS[dimension], [ALL, *sorted(options)],
+                format_func=lambda v: "Vše" if v == ALL else (v or "(neuvedeno)"),
+                key=f"attribution_filter_{dimension}",
+            )
+        if value != ALL:
+            filters[dimension] = value
+    
+    # The metric's cost for the month at the current prices, split by usage share
+    metric_usage = cube.total(metric, month)
+    limit = df.loc[df["Metric"] == metric, "Limit"].iloc[0]
+    _, _, metric_cost = compute_cost_micros([metric], [metric_usage], [limit], [unit_costs.get(metric, 0)])
+    rows = lookup(metric, month, by, tuple(filters.items()))
+    attributed = attribute_cost(rows["value"], metric_usage, metric_cost[0])
+    
+    st.table(pd.DataFrame({
+        DIMENSION_LABELS[by]: [value or "(neuvedeno)" for value in rows[by]],
+        "Spotřeba": rows["value"].round(2),
+        "Podíl": [f"{value / metric_usage:.1%}" if metric_usage else "" for value in rows["value"]],
+        "Náklady ($)": format_money_column(attributed),
+    }))
+    st.caption(
+        f"{metric} za {month}: spotřeba {metric_usage:,.2f}, náklady ${format_money(metric_cost[0])} "
+        "při aktuálních cenách, rozděleno podle podílu na spotřebě."
+    )
 
 # Tab 4: Forecasting Overusage
-with tab4:
+# Depends on the usage data and the prices; its inputs rerun just this fragment
+@st.fragment
+@tracer.traced("Tab 4: Plánování")
+def render_planning_tab():
     st.write("### Plánované náklady při dokupu")
     
     # Add explanation in a styled container
@@ -488,39 +626,49 @@ with tab4:
     forecasted_usage_values = {}
     forecasted_price_values = {}
     
+    # Pre-fill the planned usage from the trend of the stored history (new days are folded in incrementally)
+    @tracer.traced("Předpověď spotřeby")
+    def forecast_usage():
+        forecaster = TrendForecaster(rollup_store)
+        forecaster.sync()
+        return {metric: forecaster.forecast_month(metric) for metric in data["Metric"]}
+    
+    usage_forecast = cost_cache.results.get_or_compute(("forecast", rollup_key), forecast_usage) if rollup_store else {}
+    
     # First collect all inputs
-    for i, metric in enumerate(data["Metric"]):
-        # Skip Premium SLA as it's a fixed price
-        if metric == "Premimum SLA":
-            fixed_price = unit_costs.get(metric, 0) * data["Current Spend"][data["Metric"].index(metric)]
-            forecasted_costs.append(fixed_price)
-            forecasted_usage_values[metric] = data["Current Spend"][data["Metric"].index(metric)]
-            forecasted_price_values[metric] = unit_costs.get(metric, 0)
-            continue
+    with tracer.span("Plánovaná spotřeba"):
+        for i, metric in enumerate(data["Metric"]):
+            # Skip fixed-price metrics (Premium SLA)
+            if rules.kind(metric) == FIXED:
+                fixed_price = line_cost_micros(metric, data["Current Spend"][data["Metric"].index(metric)], unit_costs.get(metric, 0))
+                forecasted_costs.append(fixed_price)
+                forecasted_usage_values[metric] = data["Current Spend"][data["Metric"].index(metric)]
+                forecasted_price_values[metric] = unit_costs.get(metric, 0)
+                continue
             
-        # Place input fields in alternating columns with card styling
-        with col1 if i % 2 == 0 else col2:
-            st.markdown(f"""
-            <div class="card">
-                <h4 style="color:#1f77b4;margin-bottom:5px;">{metric}</h4>
-                <p>Zadejte plánovanou spotřebu:</p>
-            </div>
-            """, unsafe_allow_html=True)
+            # Place input fields in alternating columns with card styling
+            with col1 if i % 2 == 0 else col2:
+                st.markdown(f"""
+                <div class="card">
+                    <h4 style="color:#1f77b4;margin-bottom:5px;">{metric}</h4>
+                    <p>Zadejte plánovanou spotřebu:</p>
+                </div>
+                """, unsafe_allow_html=True)
             
-            forecasted_usage = st.number_input(f"{metric}", min_value=0, step=1, format="%d")
-            forecasted_usage_values[metric] = forecasted_usage
+                st.session_state.setdefault(f"planned_{metric}", int(round(usage_forecast.get(metric) or 0)))
+                forecasted_usage = st.number_input(f"{metric}", min_value=0, step=1, format="%d", key=f"planned_{metric}")
+                forecasted_usage_values[metric] = forecasted_usage
             
-            # Calculate price based on the metric
-            if metric == "Počet projektů":
-                unit_price = get_price(forecasted_usage, project_pricing)
-            elif metric == "PPU":
-                unit_price = get_price(forecasted_usage, ppu_pricing)
-            else:
-                unit_price = unit_costs.get(metric, 0)
+                # Calculate price based on the metric
+                tier_table = rules.tier_table(metric)
+                if tier_table is not None:
+                    unit_price = get_price(forecasted_usage, tier_table)
+                else:
+                    unit_price = unit_costs.get(metric, 0)
                 
-            forecasted_price_values[metric] = unit_price
-            forecasted_cost = forecasted_usage * unit_price
-            forecasted_costs.append(forecasted_cost)
+                forecasted_price_values[metric] = unit_price
+                forecasted_cost = line_cost_micros(metric, forecasted_usage, unit_price)
+                forecasted_costs.append(forecasted_cost)
     
     # Add divider
     st.markdown("---")
@@ -543,18 +691,208 @@ with tab4:
     forecast_df = pd.DataFrame(forecast_data)
     
     # Format the numbers with commas and 2 decimal places
-    for col in ["Cena za jednotku ($)", "Celková cena ($)"]:
-        forecast_df[col] = forecast_df[col].apply(lambda x: f"{x:,.2f}")
+    with tracer.span("Formátování čísel"):
+        forecast_df["Cena za jednotku ($)"] = forecast_df["Cena za jednotku ($)"].apply(lambda x: f"{x:,.2f}")
+        forecast_df["Celková cena ($)"] = format_money_column(forecasted_costs)
     
     # Display the table
     st.table(forecast_df)
 
     # Calculate and display the total forecasted cost
-    total_forecasted_cost = sum(forecasted_costs)
+    total_forecasted_cost = total_micros(forecasted_costs)
     
     # Create a visually appealing total cost display
     st.markdown(f"""
     <div class="total-box">
-        <h2 style="margin:0;">Celkové plánované náklady: ${total_forecasted_cost:,.2f}</h2>
+        <h2 style="margin:0;">Celkové plánované náklady: ${format_money(total_forecasted_cost)}</h2>
+    </div>
+    """, unsafe_allow_html=True) 
+    
+    # Add divider
+    st.markdown("---")
+    
+    # Scenario sweep: the whole cost curve over a grid of planned volumes
+    st.markdown("""
+    <div style="background-color:#1f77b4;color:white;padding:10px;border-radius:5px;margin-bottom:10px;text-align:center;">
+        <h4 style="margin:0;">Scénáře spotřeby</h4>
     </div>
-    """, unsafe_allow_html=True) 
\ No newline at end of file
+    """, unsafe_allow_html=True)
+    
+    if st.checkbox("Zobrazit křivku nákladů", key="scenario_sweep"):
+        render_scenario_sweep(forecasted_usage_values)
+    
+    # Add divider
+    st.markdown("---")
+    
+    # Monte Carlo forecast: annual cost percentiles and limit breach probabilities
+    st.markdown("""
+    <div style="background-color:#1f77b4;color:white;padding:10px;border-radius:5px;margin-bottom:10px;text-align:center;">
+        <h4 style="margin:0;">Pravděpodobnostní plán</h4>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    if st.checkbox("Zobrazit pravděpodobnostní plán", key="monte_carlo"):
+        render_monte_carlo()
+    
+    # Add divider
+    st.markdown("---")
+    
+    # Commit limits with the lowest expected annual cost
+    st.markdown("""
+    <div style="background-color:#1f77b4;color:white;padding:10px;border-radius:5px;margin-bottom:10px;text-align:center;">
+        <h4 style="margin:0;">Optimalizace limitů</h4>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    if st.checkbox("Zobrazit doporučené limity", key="limit_optimizer"):
+        render_limit_optimizer()
+
+# Tab 4 scenario sweep: cost curve, tier breakpoints and the cheapest purchase for the planned usage
+@tracer.traced("Scénáře spotřeby")
+def render_scenario_sweep(forecasted_usage_values):
+    sweep_metrics = [m for m in data["Metric"] if rules.kind(m) != FIXED]
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        sweep_metric = st.selectbox("Metrika", sweep_metrics, key="sweep_metric")
+    
+    # Default range covers twice the current usage and every tier breakpoint
+    breakpoints = tier_breakpoints(sweep_metric)
+    current_usage = data["Current Spend"][data["Metric"].index(sweep_metric)]
+    default_max = int(max(current_usage * 2, breakpoints.max() * 2 if len(breakpoints) else 0, 10))
+    st.session_state.setdefault(f"sweep_max_{sweep_metric}", default_max)
+    st.session_state.setdefault("sweep_points", 100_000)
+    with col2:
+        max_volume = st.number_input("Maximální spotřeba", min_value=1, step=1, key=f"sweep_max_{sweep_metric}")
+    with col3:
+        points = st.select_slider("Počet bodů", options=[1_000, 10_000, 100_000], key="sweep_points")
+    
+    # Price the whole grid in one batched computation
+    curve = sweep(sweep_metric, max_volume, points, unit_costs)
+    chart_df = plot_points(curve, breakpoints).rename(columns={
+        "volume": "Plánovaná spotřeba",
+        "cost": "Celková cena ($)",
+        "cheapest_cost": "Nejlevnější nákup ($)",
+    })
+    st.line_chart(chart_df.set_index("Plánovaná spotřeba")[["Celková cena ($)", "Nejlevnější nákup ($)"]])
+    
+    # Breakpoints where the unit price (and so the marginal cost) jumps
+    if len(breakpoints):
+        breakpoint_df = pd.DataFrame({
+            "Hranice pásma": [f"{b:,.0f}" for b in breakpoints],
+            "Cena za jednotku ($)": [get_price(b, tier_tables[sweep_metric]) for b in breakpoints],
+            "Cena těsně pod hranicí ($)": forecast_costs(sweep_metric, breakpoints - 1, unit_costs),
+            "Cena na hranici ($)": forecast_costs(sweep_metric, breakpoints, unit_costs),
+        })
+        for col in breakpoint_df.columns[1:]:
+            breakpoint_df[col] = breakpoint_df[col].apply(lambda x: f"{x:,.2f}")
+        st.table(breakpoint_df)
+    
+    # Cheapest band to buy into for the planned usage
+    planned_usage = forecasted_usage_values.get(sweep_metric, 0)
+    buy_volumes, buy_costs = cheapest_purchase(sweep_metric, [planned_usage], unit_costs)
+    if buy_volumes[0] > planned_usage:
+        st.info(
+            f"Pro plánovanou spotřebu {planned_usage:,} je výhodnější nakoupit {buy_volumes[0]:,.0f} jednotek "
+            f"za ${buy_costs[0]:,.2f} místo ${float(forecast_costs(sweep_metric, planned_usage, unit_costs)):,.2f}."
+        )
+    else:
+        st.info(f"Pro plánovanou spotřebu {planned_usage:,} je nejvýhodnější nakoupit přesně tolik jednotek (${buy_costs[0]:,.2f}).")
+
+# Tab 4 Monte Carlo forecast: annual cost percentiles and limit breach probabilities
+@tracer.traced("Monte Carlo")
+def render_monte_carlo():
+    st.session_state.setdefault("mc_paths", 100_000)
+    st.session_state.setdefault("mc_variability", 20)
+    col1, col2 = st.columns(2)
+    with col1:
+        simulated_paths = st.select_slider("Počet simulací", options=[10_000, 100_000, 1_000_000], key="mc_paths")
+    
+    # Monthly usage variance comes from the complete months of the stored history; without them,
+    # from an assumed variability
+    history = rollup_store.history("month", complete=True) if rollup_store is not None else None
+    if history is not None and not history.empty:
+        usage_mean, usage_std = history_stats(history, data["Metric"])
+        variability = None
+    else:
+        with col2:
+            variability = st.slider("Měsíční variabilita spotřeby (%)", min_value=0, max_value=100, key="mc_variability")
+        usage_mean = df["Current Spend"].to_numpy(dtype=float)
+        usage_std = usage_mean * variability / 100
+    
+    simulation_df = cost_cache.results.get_or_compute(
+        ("monte_carlo", usage_key, rollup_key, prices_key, simulated_paths, variability),
+        lambda: simulate(
+            data["Metric"], usage_mean, usage_std, df["Limit"].to_numpy(),
+            [unit_costs.get(m, 0) for m in data["Metric"]], paths=simulated_paths, seed=0,
+        ),
+    ).copy()
+    
+    for col in ["P50 ($)", "P90 ($)", "P99 ($)"]:
+        simulation_df[col] = simulation_df[col].apply(lambda x: f"{x:,.2f}")
+    simulation_df["Pravděpodobnost překročení limitu"] = simulation_df["Pravděpodobnost překročení limitu"].apply(lambda x: f"{x:.1%}")
+    st.table(simulation_df)
+
+
+# Tab 4 limit optimizer: the monthly commitment per metric with the lowest expected annual cost
+@tracer.traced("Optimalizace limitů")
+def render_limit_optimizer():
+    # Monthly usage distribution from the complete months of the stored history; without them,
+    # from an assumed variability
+    history = rollup_store.history("month", complete=True) if rollup_store is not None else None
+    if history is not None and not history.empty:
+        history = history.reindex(columns=data["Metric"]).fillna(0)
+        usage_points = [history[metric].to_numpy() for metric in data["Metric"]]
+        variability = None
+    else:
+        st.session_state.setdefault("optimizer_variability", 20)
+        variability = st.slider("Měsíční variabilita spotřeby (%)", min_value=0, max_value=100, key="optimizer_variability")
+        usage_points = [
+            lognormal_points(spend, spend * variability / 100) for spend in df["Current Spend"].to_numpy(dtype=float)
+        ]
+    
+    optimizer_df = cost_cache.results.get_or_compute(
+        ("limit_optimizer", usage_key, rollup_key, prices_key, variability),
+        lambda: optimize_limits(
+            data["Metric"], usage_points, df["Limit"].to_numpy(), [unit_costs.get(m, 0) for m in data["Metric"]]
+        ),
+    ).copy()
+    
+    for col in ["Roční náklady se současným limitem ($)", "Roční náklady s doporučeným limitem ($)", "Úspora ($)"]:
+        optimizer_df[col] = optimizer_df[col].apply(lambda x: f"{x:,.2f}")
+    optimizer_df["Doporučený limit"] = optimizer_df["Doporučený limit"].apply(lambda x: f"{x:,.0f}")
+    st.table(optimizer_df)
+    st.caption(
+        "Limit je měsíční závazek: platí se i nevyčerpaná část, spotřeba nad limitem se účtuje podle pravidel "
+        "pro nadspotřebu. Kandidáti jsou jen body zlomu nákladové funkce (hranice pásem a spotřeby)."
+    )
+
+
+# Render only the open tab
+if tab1.open:
+    with tab1:
+        render_usage_tab()
+
+if tab2.open:
+    with tab2:
+        render_prices_tab()
+
+if tab3.open:
+    with tab3:
+        render_costs_tab()
+
+if tab4.open:
+    with tab4:
+        render_planning_tab()
+
+# Timing panel: section breakdown of this rerun and a Chrome-trace export of the recorded reruns
+tracer.end_rerun()
+if tracer.enabled:
+    with st.sidebar.expander("Časování běhu", expanded=False):
+        st.dataframe(tracer.breakdown(), hide_index=True)
+        st.write("Poslední běhy (včetně samostatných běhů fragmentů):")
+        st.dataframe(tracer.rerun_totals(), hide_index=True)
+        st.download_button(
+            "Export (Chrome trace JSON)", data=tracer.chrome_trace, file_name="keboola-finops-trace.json",
+            mime="application/json", on_click="ignore",
+        )
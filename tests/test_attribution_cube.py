@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from keboola_finops.attribution_cube import FOLD_CHUNKS, load_daily_attribution
+
+
+@pytest.fixture
+def export(tmp_path):
+    rng = np.random.default_rng(0)
+    rows = 2000
+    frame = pd.DataFrame({
+        "date": pd.Timestamp(2025, 3, 1) + pd.to_timedelta(rng.integers(0, 31 * 24, rows), unit="h"),
+        "project_id": rng.integers(0, 5, rows).astype(str),
+        "metric": rng.choice(["PPU", "Snowflake credits", "Snowflake storage"], rows),
+        "component": rng.choice(["keboola.ex-db-snowflake", "keboola.python-transformation-v2"], rows),
+        "configuration_id": rng.integers(0, 3, rows).astype(str),
+        "user": rng.choice(["anna", "petr"], rows),
+        "value": rng.integers(1, 100, rows).astype(float),
+    })
+    path = tmp_path / "usage.csv"
+    frame.to_csv(path, index=False)
+    return path, frame
+
+
+def test_chunked_totals_match_one_pass(export):
+    path, _ = export
+    whole = load_daily_attribution(path, chunksize=100_000)
+    # Many more chunks than FOLD_CHUNKS, so the running totals are folded several times
+    chunked = load_daily_attribution(path, chunksize=2000 // (FOLD_CHUNKS * 4))
+    pd.testing.assert_frame_equal(whole, chunked)
+
+
+def test_levels_are_skipped_and_flows_are_totalled_per_day(export):
+    path, frame = export
+    leaves = load_daily_attribution(path, chunksize=64)
+    assert set(leaves["metric"]) == {"PPU", "Snowflake credits"}
+    flows = frame[frame["metric"] != "Snowflake storage"]
+    assert leaves["value"].sum() == flows["value"].sum()
+    daily = flows.groupby(flows["date"].dt.normalize())["value"].sum()
+    assert leaves.groupby("date")["value"].sum().to_dict() == daily.to_dict()
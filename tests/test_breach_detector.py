@@ -0,0 +1,69 @@
+import pandas as pd
+
+from keboola_finops.breach_detector import (
+    LIMIT_BREACHED, LIMIT_PROJECTED, MIN_ELAPSED_DAYS, TIER_PROJECTED, BreachDetector,
+)
+
+LIMITS = {"PPU": 28000, "CS Mds": 15}
+
+
+def feed(detector, daily_usage, metric="PPU"):
+    raised = []
+    for day, value in daily_usage:
+        raised += detector.add(pd.Timestamp(2025, 3, day), "p1", metric, value)
+    return raised
+
+
+def test_first_day_spike_is_not_extrapolated():
+    detector = BreachDetector(LIMITS)
+    assert feed(detector, [(1, 1750)]) == []
+    assert detector.projected("PPU") == 1750
+    assert detector.alerts_by_metric() == {}
+
+
+def test_projection_starts_after_min_elapsed_days():
+    detector = BreachDetector(LIMITS)
+    feed(detector, [(day, 1000) for day in range(1, int(MIN_ELAPSED_DAYS) + 1)])
+    assert detector.projected("PPU") == 1000 * 31
+
+
+def test_first_day_spike_then_normal_usage_clears_the_shown_alerts():
+    detector = BreachDetector(LIMITS)
+    raised = feed(detector, [(1, 1750), (2, 600), (3, 600)])
+    assert [alert["kind"] for alert in raised] == [LIMIT_PROJECTED, TIER_PROJECTED]
+
+    feed(detector, [(day, 600) for day in range(4, 16)])
+    assert detector.projected("PPU") < LIMITS["PPU"]
+    assert detector.alerts_by_metric() == {}
+
+
+def test_shown_alerts_follow_the_current_projection():
+    detector = BreachDetector(LIMITS)
+    raised = feed(detector, [(1, 9000), (2, 100), (3, 100)])
+    # The early projection (95,067) crosses every band of the PPU tier table
+    assert [alert["band"] for alert in raised if alert["kind"] == TIER_PROJECTED] == [1, 2, 3, 4]
+
+    feed(detector, [(day, 600) for day in range(4, 16)])
+    projected = detector.projected("PPU")
+    assert round(projected) == 33893
+    [alert] = detector.alerts_by_metric()["PPU"]
+    assert (alert["kind"], alert["band"], alert["volume"]) == (TIER_PROJECTED, 2, projected)
+    assert alert["message"].startswith("Nadspotřeba 5,893 dosáhne pásma 3")
+
+
+def test_breach_and_projection_are_both_shown():
+    detector = BreachDetector(LIMITS)
+    feed(detector, [(day, 4) for day in range(1, 6)], metric="CS Mds")
+    kinds = [alert["kind"] for alert in detector.alerts_by_metric()["CS Mds"]]
+    assert kinds == [LIMIT_BREACHED, LIMIT_PROJECTED]
+
+
+def test_new_month_resets_totals_and_late_events_are_counted():
+    detector = BreachDetector(LIMITS)
+    feed(detector, [(day, 2000) for day in range(1, 20)])
+    detector.add(pd.Timestamp(2025, 4, 1), "p1", "PPU", 10)
+    detector.add(pd.Timestamp(2025, 3, 30), "p1", "PPU", 10)
+    assert detector.month == (2025, 4)
+    assert detector.totals == {"PPU": 10}
+    assert detector.late_events == 1
+    assert detector.alerts_by_metric() == {}
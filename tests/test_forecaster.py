@@ -0,0 +1,110 @@
+import json
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from keboola_finops.forecaster import HoltWinters, TrendForecaster
+from keboola_finops.rollup_store import RollupStore
+
+# Weekdays at 1000, weekends at 200 - the weekly pattern the model has to keep aligned
+WEEKDAY, WEEKEND = 1000.0, 200.0
+
+
+def usage(start, end, skip=()):
+    days = [day for day in pd.date_range(start, end, freq="D") if day.strftime("%Y-%m-%d") not in skip]
+    values = [WEEKEND if day.weekday() >= 5 else WEEKDAY for day in days]
+    return pd.DataFrame({"date": days, "metric": "PPU", "value": values})
+
+
+@pytest.fixture
+def store():
+    store = RollupStore(":memory:")
+    yield store
+    store.close()
+
+
+def fresh_forecast(frame, days=14):
+    store = RollupStore(":memory:")
+    store.append(frame)
+    forecaster = TrendForecaster(store)
+    forecaster.sync()
+    forecast = forecaster.models["PPU"].forecast(days)
+    store.close()
+    return forecast
+
+
+def test_seasonality_follows_the_weekday():
+    frame = usage("2025-01-06", "2025-03-02")  # Monday to Sunday, eight weeks
+    model = HoltWinters.fit(frame["value"], days=frame["date"].dt.strftime("%Y-%m-%d"))
+    forecast = model.forecast(7)  # Monday 2025-03-03 onwards
+    assert forecast[:5].min() > forecast[5:].max()
+
+
+def test_missing_days_do_not_shift_the_weekly_pattern():
+    skip = ("2025-01-15", "2025-02-04", "2025-02-05")
+    frame = usage("2025-01-06", "2025-03-02", skip=skip)
+    model = HoltWinters.fit(frame["value"], days=frame["date"].dt.strftime("%Y-%m-%d"))
+    forecast = model.forecast(14)
+    weekends = [day.weekday() >= 5 for day in pd.date_range("2025-03-03", periods=14)]
+    assert forecast[~np.array(weekends)].min() > forecast[np.array(weekends)].max()
+    np.testing.assert_allclose(forecast, fresh_forecast(usage("2025-01-06", "2025-03-02")), rtol=0.05)
+
+
+def test_incremental_sync_matches_a_full_fit(store):
+    forecaster = TrendForecaster(store)
+    store.append(usage("2025-01-06", "2025-02-16"))
+    forecaster.sync()
+    store.append(usage("2025-02-17", "2025-03-02"))
+    forecaster.sync()
+    np.testing.assert_allclose(forecaster.models["PPU"].forecast(14), fresh_forecast(usage("2025-01-06", "2025-03-02")))
+
+
+def test_backfilled_day_refits_the_model(store):
+    skip = ("2025-02-04",)
+    forecaster = TrendForecaster(store)
+    store.append(usage("2025-01-06", "2025-03-02", skip=skip))
+    forecaster.sync()
+    gapped = forecaster.models["PPU"].forecast(14)
+
+    # The late day is a spike, so folding it in has to move the forecast
+    late = usage("2025-02-04", "2025-02-04")
+    late["value"] = 3000.0
+    store.append(late)
+    forecaster.sync()
+    backfilled = forecaster.models["PPU"].forecast(14)
+    assert not np.allclose(backfilled, gapped)
+    np.testing.assert_allclose(backfilled, fresh_forecast(pd.concat([usage("2025-01-06", "2025-03-02", skip=skip), late])))
+
+
+def test_corrected_day_refits_the_model(store):
+    forecaster = TrendForecaster(store)
+    store.append(usage("2025-01-06", "2025-03-02"))
+    forecaster.sync()
+
+    corrected = usage("2025-02-10", "2025-02-10")
+    corrected["value"] = 5000.0
+    store.append(corrected)
+    forecaster.sync()
+
+    expected = usage("2025-01-06", "2025-03-02")
+    expected.loc[expected["date"] == pd.Timestamp(2025, 2, 10), "value"] = 5000.0
+    np.testing.assert_allclose(forecaster.models["PPU"].forecast(14), fresh_forecast(expected))
+
+
+def test_state_is_persisted_and_old_states_are_refitted(store):
+    store.append(usage("2025-01-06", "2025-03-02"))
+    TrendForecaster(store).sync()
+    reloaded = TrendForecaster(store)
+    assert reloaded.models["PPU"].last_day == date(2025, 3, 2).isoformat()
+    expected = reloaded.models["PPU"].forecast(14)
+
+    # A state saved before the checksum existed is refitted rather than trusted
+    state = json.loads(reloaded.models["PPU"].to_json())
+    del state["checksum"]
+    state["seasonal"] = [0.0] * 7
+    store.connection.execute("UPDATE forecast_state SET state = ? WHERE series = 'PPU'", (json.dumps(state),))
+    old = TrendForecaster(store)
+    old.sync()
+    np.testing.assert_allclose(old.models["PPU"].forecast(14), expected)
@@ -0,0 +1,129 @@
+from decimal import ROUND_HALF_UP, Decimal
+
+import numpy as np
+import pytest
+
+from keboola_finops.cost_engine import calculate_cost, compute_cost_micros
+from keboola_finops.money import DOWN, HALF_EVEN, HALF_UP, UP, format_money, round_micros, to_micros
+
+# Tier tables and over-limit premium of the original single-file app
+PROJECT_PRICING = {
+    (0, 5): 500,
+    (6, 10): 475,
+    (11, 25): 450,
+    (26, float("inf")): 425,
+}
+PPU_PRICING = {
+    (0, 2000): 1.00,
+    (2001, 5000): 0.95,
+    (5001, 10000): 0.90,
+    (10001, 20000): 0.85,
+    (20001, float("inf")): 0.80,
+}
+
+
+def original_price(volume, pricing_table):
+    for (min_vol, max_vol), price in pricing_table.items():
+        if min_vol <= volume <= max_vol:
+            return price
+    return pricing_table[max(pricing_table)]
+
+
+# (in_limit_cost, over_limit_cost) in USD as the original calculate_cost priced them
+def original_cost_parts(metric, spend, limit, unit_cost):
+    if spend <= limit or metric == "Premimum SLA":
+        return spend * unit_cost, 0.0
+    in_limit = min(spend, limit)
+    over_limit = spend - limit
+    if metric in ("Počet projektů", "PPU"):
+        pricing_table = PROJECT_PRICING if metric == "Počet projektů" else PPU_PRICING
+        return in_limit * original_price(limit, pricing_table), over_limit * original_price(over_limit, pricing_table)
+    return in_limit * unit_cost, over_limit * unit_cost * 1.3
+
+
+def cents_to_micros(amount):
+    return int(Decimal(str(amount)).quantize(Decimal("0.01"), ROUND_HALF_UP) * 1_000_000)
+
+
+@pytest.mark.parametrize("micros, places, mode, expected", [
+    (1_234_565_000, 2, HALF_UP, 1_234_570_000),
+    (1_234_565_000, 2, HALF_EVEN, 1_234_560_000),
+    (1_234_575_000, 2, HALF_EVEN, 1_234_580_000),
+    (1_234_561_000, 2, UP, 1_234_570_000),
+    (1_234_569_000, 2, DOWN, 1_234_560_000),
+    (-1_234_565_000, 2, HALF_UP, -1_234_570_000),
+    (-1_234_561_000, 2, UP, -1_234_570_000),
+    (-1_234_569_000, 2, DOWN, -1_234_560_000),
+    (1_500_000, 0, HALF_UP, 2_000_000),
+    (2_500_000, 0, HALF_EVEN, 2_000_000),
+    (1_234_567, 6, HALF_UP, 1_234_567),
+    (0, 2, UP, 0),
+])
+def test_round_micros(micros, places, mode, expected):
+    assert round_micros(micros, places, mode) == expected
+
+
+def test_round_micros_per_row_rules():
+    rounded = round_micros([1_005_000, 1_005_000, 1_005_000], places=[2, 2, 1], mode=[HALF_UP, HALF_EVEN, DOWN])
+    assert rounded.tolist() == [1_010_000, 1_000_000, 1_000_000]
+
+
+@pytest.mark.parametrize("micros, kwargs, expected", [
+    (1_234_567_890_000, {}, "1,234,567.89"),
+    (5_000, {}, "0.01"),
+    (4_999, {}, "0.00"),
+    (-1_234_565_000, {}, "-1,234.57"),
+    (1_234_565_000, {"separator": ""}, "1234.57"),
+    (1_234_500_000, {"places": 0}, "1,235"),
+    (0, {}, "0.00"),
+])
+def test_format_money(micros, kwargs, expected):
+    assert format_money(micros, **kwargs) == expected
+
+
+def test_format_money_keeps_cents_of_large_amounts():
+    assert format_money(9_007_199_254_745_993) == "9,007,199,254.75"
+
+
+CASES = [
+    # Under the limit: spend at the unit cost
+    ("PPU", 1500, 28000, 0.75),
+    ("CS Mds", 5, 15, 500.0),
+    ("Snowflake credits", 4167, 4167, 4.0),
+    # Tiered over the limit: both parts at the band price of their volume
+    ("Počet projektů", 150, 130, 377.0),
+    ("Počet projektů", 12, 5, 377.0),
+    ("PPU", 30000, 28000, 0.75),
+    ("PPU", 45000, 20000, 0.75),
+    # Premium over the limit: 30% on the over-limit part
+    ("CS Mds", 20, 15, 500.0),
+    ("Snowflake credits", 4500, 4167, 4.0),
+    ("Snowflake storage", 101.5, 100, 23.0),
+    # Fixed price regardless of the limit
+    ("Premimum SLA", 13043, 13043, 1.0),
+    ("Premimum SLA", 15000, 13043, 1.0),
+]
+
+
+@pytest.mark.parametrize("metric, spend, limit, unit_cost", CASES)
+def test_compute_cost_micros_matches_original_pricing(metric, spend, limit, unit_cost):
+    in_limit_cost, over_limit_cost, total = compute_cost_micros(metric, spend, limit, unit_cost)
+    expected_in, expected_over = (cents_to_micros(part) for part in original_cost_parts(metric, spend, limit, unit_cost))
+    assert (in_limit_cost, over_limit_cost) == (expected_in, expected_over)
+    assert total == in_limit_cost + over_limit_cost
+
+
+def test_compute_cost_micros_columns_match_rows():
+    metrics, spend, limit, unit_cost = (list(column) for column in zip(*CASES))
+    columns = compute_cost_micros(metrics, spend, limit, unit_cost)
+    rows = [compute_cost_micros(*case) for case in CASES]
+    for column, part in zip(columns, zip(*rows)):
+        np.testing.assert_array_equal(column, part)
+
+
+@pytest.mark.parametrize("metric, spend, limit, unit_cost", CASES)
+def test_calculate_cost_total_and_explanation(metric, spend, limit, unit_cost):
+    cost, details = calculate_cost(metric, spend, limit, unit_cost)
+    _, _, total = compute_cost_micros(metric, spend, limit, unit_cost)
+    assert to_micros(cost) == total
+    assert f"${format_money(total, separator='')}" in details
@@ -0,0 +1,96 @@
+import json
+
+import pytest
+
+from keboola_finops.pricing_rules import DEFAULT_RULES_PATH, FIXED, PREMIUM, TIERED, PricingRuleError, RuleTable, validate
+
+
+@pytest.fixture
+def config():
+    with open(DEFAULT_RULES_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def errors_of(config):
+    with pytest.raises(PricingRuleError) as error:
+        validate(config)
+    return str(error.value).splitlines()[1:]
+
+
+def test_default_rules_are_valid(config):
+    validate(config)
+    rules = RuleTable(config)
+    assert rules.kind("PPU") == TIERED
+    assert rules.kind("Premimum SLA") == FIXED
+    assert rules.kind("CS Mds") == PREMIUM
+    assert rules.kind("not in the config") == PREMIUM
+
+
+def test_tier_tables_are_optional():
+    config = {"over_limit_premium": 1.3, "metrics": {"CS Mds": {"rule": "premium", "unit_cost": 500.0}}}
+    rules = RuleTable(config)
+    assert rules.tier_list == []
+    assert rules.tier_table("CS Mds") is None
+
+
+def test_tiered_rule_needs_a_tier_table(config):
+    del config["tier_tables"]
+    assert errors_of(config) == [
+        "- metric 'Počet projektů': unknown tier table 'project'",
+        "- metric 'PPU': unknown tier table 'ppu'",
+    ]
+
+
+def test_every_problem_is_reported(config):
+    config["over_limit_premium"] = 0
+    config["metrics"]["PPU"]["rule"] = "tierd"
+    config["metrics"]["CS Mds"]["unit_cost"] = -1
+    config["metrics"]["Snowflake storage"]["aggregation"] = "max"
+    assert errors_of(config) == [
+        "- over_limit_premium must be a positive number",
+        "- metric 'PPU': rule must be one of premium, tiered, fixed",
+        "- metric 'CS Mds': unit_cost must be a non-negative number",
+        "- metric 'Snowflake storage': aggregation must be one of sum, nunique, latest",
+    ]
+
+
+def test_unknown_keys_are_reported(config):
+    config["premuim"] = 1.2
+    config["metrics"]["CS Mds"]["premuim"] = 1.5
+    config["tier_tables"]["ppu"][0]["prize"] = 1.0
+    config["rounding"]["digits"] = 2
+    assert errors_of(config) == [
+        "- config: unknown key 'premuim'",
+        "- config rounding: unknown key 'digits'",
+        "- tier table 'ppu' band 0: unknown key 'prize'",
+        "- metric 'CS Mds': unknown key 'premuim'",
+    ]
+
+
+@pytest.mark.parametrize("change, expected", [
+    (lambda c: c.update(metrics=[]), "metrics must be an object mapping metric names to rules"),
+    (lambda c: c.update(metrics={}), "no metrics defined"),
+    (lambda c: c.update(tier_tables=[]), "tier_tables must be an object mapping table names to bands"),
+    (lambda c: c["tier_tables"].update(ppu={}), "tier table 'ppu' must be a list of bands"),
+    (lambda c: c["tier_tables"].update(ppu=[]), "tier table 'ppu' has no bands"),
+    (lambda c: c["tier_tables"]["ppu"].__setitem__(1, "band"), "tier table 'ppu' band 1: must be an object"),
+    (lambda c: c["tier_tables"]["ppu"][1].update(max="5000"), "tier table 'ppu' band 1: max must be a number"),
+    (lambda c: c["tier_tables"]["ppu"][1].update(price=None), "tier table 'ppu' band 1: min and price must be numbers"),
+    (lambda c: c["tier_tables"]["ppu"][2].update(min=4000), "tier table 'ppu' band 2: overlaps the previous band"),
+    (lambda c: c["tier_tables"]["ppu"][0].update(max=None), "tier table 'ppu' band 0: only the last band"),
+    (lambda c: c["metrics"].update(PPU=["tiered"]), "metric 'PPU': rule must be an object"),
+    (lambda c: c["metrics"]["PPU"].update(rule=["tiered"]), "metric 'PPU': rule must be one of"),
+    (lambda c: c["metrics"]["PPU"].update(tier_table=["ppu"]), "metric 'PPU': unknown tier table"),
+    (lambda c: c["metrics"]["CS Mds"].update(premium=True), "metric 'CS Mds': premium must be a positive number"),
+    (lambda c: c["metrics"]["CS Mds"].update(rounding=2), "metric 'CS Mds': rounding must be an object"),
+    (lambda c: c.update(rounding={"places": 7}), "config: rounding places must be an integer from 0 to 6"),
+    (lambda c: c.update(rounding={"mode": ["up"]}), "config: rounding mode must be one of"),
+])
+def test_malformed_config_is_reported_not_crashed(config, change, expected):
+    change(config)
+    assert any(error.startswith(f"- {expected}") for error in errors_of(config))
+
+
+def test_config_must_be_an_object():
+    with pytest.raises(PricingRuleError, match="the config must be an object"):
+        validate([])
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from keboola_finops.monte_carlo import history_stats
+from keboola_finops.rollup_store import RollupStore
+
+
+# Daily PPU usage of `per_day` on every day from start to end (inclusive)
+def daily_usage(start, end, per_day):
+    days = pd.date_range(start, end, freq="D")
+    return pd.DataFrame({"date": days, "metric": "PPU", "value": float(per_day)})
+
+
+@pytest.fixture
+def store():
+    store = RollupStore(":memory:")
+    yield store
+    store.close()
+
+
+def test_history_keeps_the_partial_current_month(store):
+    store.append(daily_usage("2025-01-01", "2025-03-15", 1000))
+    history = store.history("month")
+    assert history.index.tolist() == ["2025-01", "2025-02", "2025-03"]
+    assert history["PPU"].tolist() == [31000, 28000, 15000]
+
+
+def test_complete_history_drops_partial_months(store):
+    store.append(daily_usage("2025-01-10", "2025-04-15", 1000))
+    history = store.history("month", complete=True)
+    assert history.index.tolist() == ["2025-02", "2025-03"]
+
+
+def test_complete_history_keeps_a_month_ending_on_its_last_day(store):
+    store.append(daily_usage("2025-01-01", "2025-02-28", 1000))
+    assert store.history("month", complete=True).index.tolist() == ["2025-01", "2025-02"]
+
+
+def test_complete_history_of_less_than_a_month_is_empty(store):
+    store.append(daily_usage("2025-03-01", "2025-03-15", 1000))
+    assert store.history("month", complete=True).empty
+
+
+def test_history_stats_ignore_the_partial_month(store):
+    store.append(daily_usage("2025-01-01", "2025-01-31", 1000))
+    store.append(daily_usage("2025-02-01", "2025-02-28", 1500))
+    store.append(daily_usage("2025-03-01", "2025-03-10", 1000))
+
+    mean, std = history_stats(store.history("month", complete=True), ["PPU"])
+    assert mean[0] == pytest.approx((31000 + 42000) / 2)
+    assert std[0] == pytest.approx(np.std([31000, 42000], ddof=1))
+
+    # The partial month as a sample would pull the mean down and inflate the spread
+    partial_mean, partial_std = history_stats(store.history("month"), ["PPU"])
+    assert partial_mean[0] < mean[0]
+    assert partial_std[0] > std[0]
@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+from keboola_finops.cost_engine import calculate_cost_with_tiers, get_price
+from keboola_finops.scenarios import forecast_costs
+from keboola_finops.tiers import GRADUATED, WHOLE_VOLUME, TierTable, tier_table_of
+
+PROJECT_PRICING = {
+    (0, 5): {"discount": 0.00, "price": 500},
+    (6, 10): {"discount": 0.05, "price": 475},
+    (11, 25): {"discount": 0.10, "price": 450},
+    (26, float("inf")): {"discount": 0.15, "price": 425},
+}
+PPU_PRICING = {
+    (0, 2000): {"discount": 0.00, "price": 1.00},
+    (2001, 5000): {"discount": 0.05, "price": 0.95},
+    (5001, 10000): {"discount": 0.10, "price": 0.90},
+    (10001, 20000): {"discount": 0.15, "price": 0.85},
+    (20001, float("inf")): {"discount": 0.20, "price": 0.80},
+}
+
+
+@pytest.mark.parametrize("volume, price", [
+    (0, 500), (5, 500), (5.5, 475), (6, 475), (10, 475), (10.01, 450), (25, 450), (25.5, 425), (26, 425), (1e9, 425),
+])
+def test_band_boundaries(volume, price):
+    assert TierTable(PROJECT_PRICING).price(volume) == price
+
+
+def test_array_lookup_matches_scalar_lookups():
+    table = TierTable(PPU_PRICING)
+    volumes = np.array([0, 1999, 2000, 2000.5, 2001, 5000, 5001, 10000, 20000, 20001, 1e7])
+    np.testing.assert_array_equal(table.price(volumes), [table.price(volume) for volume in volumes])
+    assert table.price(volumes).tolist() == [1.0, 1.0, 1.0, 0.95, 0.95, 0.95, 0.9, 0.9, 0.85, 0.8, 0.8]
+
+
+def test_integer_volumes_match_the_original_linear_scan():
+    def linear_scan(volume):
+        for (min_vol, max_vol), rates in PPU_PRICING.items():
+            if min_vol <= volume <= max_vol:
+                return rates["price"]
+
+    volumes = np.arange(0, 25001)
+    np.testing.assert_array_equal(TierTable(PPU_PRICING).price(volumes), [linear_scan(v) for v in volumes.tolist()])
+
+
+@pytest.mark.parametrize("volume, cost", [
+    (0, 0.0),
+    (1500, 1500.0),
+    (2000, 2000.0),
+    (3000, 2000 + 1000 * 0.95),
+    (5000, 2000 + 3000 * 0.95),
+    (25000, 2000 + 3000 * 0.95 + 5000 * 0.90 + 10000 * 0.85 + 5000 * 0.80),
+])
+def test_graduated_totals(volume, cost):
+    assert TierTable(PPU_PRICING).cost(volume, GRADUATED) == pytest.approx(cost)
+
+
+def test_graduated_cost_is_continuous_and_increasing():
+    table = TierTable(PPU_PRICING)
+    volumes = np.linspace(0, 50000, 100_001)
+    costs = table.cost(volumes, GRADUATED)
+    assert np.all(np.diff(costs) >= 0)
+    assert np.max(np.abs(np.diff(costs))) <= 1.0 * (volumes[1] - volumes[0]) + 1e-9
+    assert np.all(costs <= volumes * 1.0 + 1e-9)
+
+
+def test_graduated_matches_band_by_band_sum():
+    table = TierTable(PPU_PRICING)
+    edges = [0, 2000, 5000, 10000, 20000, float("inf")]
+    prices = [1.00, 0.95, 0.90, 0.85, 0.80]
+    rng = np.random.default_rng(0)
+    volumes = rng.uniform(0, 60000, 1000)
+    expected = [
+        sum(max(0.0, min(volume, high) - low) * price for low, high, price in zip(edges, edges[1:], prices))
+        for volume in volumes
+    ]
+    np.testing.assert_allclose(table.cost(volumes, GRADUATED), expected)
+
+
+def test_whole_volume_cost_and_unknown_mode():
+    table = TierTable(PPU_PRICING)
+    assert table.cost(25000) == table.cost(25000, WHOLE_VOLUME) == 25000 * 0.80
+    with pytest.raises(ValueError, match="Unknown pricing mode"):
+        table.cost(100, "marginal")
+
+
+def test_raw_dicts_are_compiled_once():
+    table = tier_table_of(PPU_PRICING)
+    assert tier_table_of(dict(PPU_PRICING)) is table
+    assert tier_table_of(table) is table
+    assert get_price(3000, PPU_PRICING) == 0.95
+    assert calculate_cost_with_tiers(30000, 28000, PPU_PRICING) == pytest.approx(28000 * 0.80 + 2000 * 1.00)
+
+
+def test_forecast_costs_modes():
+    assert forecast_costs("PPU", 25000, {}) == pytest.approx(20000.0)
+    assert forecast_costs("PPU", 25000, {}, GRADUATED) == pytest.approx(21850.0)
+    assert forecast_costs("CS Mds", 10, {"CS Mds": 500.0}, GRADUATED) == 5000.0
@@ -0,0 +1,130 @@
+import time
+
+import pytest
+
+from keboola_finops.usage_fetcher import UsageFetcher, run_stub_server
+
+pytest.importorskip("aiohttp")
+
+PROJECTS = "/manage/organizations/1/projects"
+PPU = "/telemetry/ppu"
+
+
+@pytest.fixture
+def stub():
+    routes = {
+        PROJECTS: (0.0, [{"id": i} for i in range(150)]),
+        PPU: (0.0, {"data": [{"value": 12000}, {"value": 8000}]}),
+    }
+    statements = {"SELECT credits": (0.0, 3500)}
+    server = run_stub_server(routes, statements)
+    server.routes, server.statements = routes, statements
+    yield server
+    server.shutdown()
+
+
+def sources_for(server):
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    return {
+        "snowflake": {"account_url": base_url, "token": "stub"},
+        "metrics": {
+            "Počet projektů": {"kind": "json", "url": base_url + PROJECTS, "count": True},
+            "PPU": {"kind": "json", "url": base_url + PPU, "path": "data", "sum": "value"},
+            "Snowflake credits": {"kind": "snowflake", "statement": "SELECT credits"},
+        },
+    }
+
+
+# Wait for the background refresh a snapshot started, without starting another one
+def wait_for_refresh(fetcher):
+    deadline = time.monotonic() + 10
+    while fetcher.refreshing and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not fetcher.refreshing
+
+
+@pytest.fixture
+def make_fetcher(stub):
+    fetchers = []
+
+    def make(**options):
+        fetcher = UsageFetcher(sources_for(stub), **options)
+        fetchers.append(fetcher)
+        return fetcher
+
+    yield make
+    for fetcher in fetchers:
+        fetcher.close()
+
+
+def test_refresh_fetches_every_metric(stub, make_fetcher):
+    fetcher = make_fetcher()
+    fetcher.refresh().result(timeout=10)
+    assert fetcher.snapshot() == {"Počet projektů": 150, "PPU": 20000.0, "Snowflake credits": 3500.0}
+    assert fetcher.errors == {}
+    assert fetcher.refreshed_at is not None
+
+    # The second refresh reuses the pooled keep-alive connections
+    connections = stub.connections
+    fetcher.refresh().result(timeout=10)
+    assert stub.connections == connections
+
+
+def test_first_snapshot_is_empty_and_does_not_wait(stub, make_fetcher):
+    stub.routes[PPU] = (1.0, stub.routes[PPU][1])
+    fetcher = make_fetcher()
+    started = time.perf_counter()
+    assert fetcher.snapshot() == {}
+    assert time.perf_counter() - started < 0.5
+    assert fetcher.refreshing
+    wait_for_refresh(fetcher)
+    assert fetcher.snapshot()["PPU"] == 20000.0
+
+
+def test_timeout_keeps_the_last_known_value(stub, make_fetcher):
+    fetcher = make_fetcher(timeout=0.5)
+    fetcher.refresh().result(timeout=10)
+
+    stub.routes[PPU] = (2.0, {"data": [{"value": 1}]})
+    stub.statements["SELECT credits"] = (0.0, 4000)
+    fetcher.refresh().result(timeout=10)
+    values = fetcher.snapshot()
+    assert values["PPU"] == 20000.0
+    assert values["Snowflake credits"] == 4000.0
+    assert fetcher.errors["PPU"].startswith("TimeoutError")
+
+
+def test_error_keeps_the_last_known_value_until_the_endpoint_recovers(stub, make_fetcher):
+    fetcher = make_fetcher()
+    fetcher.refresh().result(timeout=10)
+
+    payload = stub.routes.pop(PROJECTS)[1]
+    fetcher.refresh().result(timeout=10)
+    assert fetcher.snapshot()["Počet projektů"] == 150
+    assert "404" in fetcher.errors["Počet projektů"]
+
+    stub.routes[PROJECTS] = (0.0, payload[:100])
+    fetcher.refresh().result(timeout=10)
+    assert fetcher.snapshot()["Počet projektů"] == 100
+    assert "Počet projektů" not in fetcher.errors
+
+
+def test_snapshot_refreshes_only_when_stale(stub, make_fetcher):
+    fetcher = make_fetcher(max_age=0.5)
+    fetcher.snapshot()
+    wait_for_refresh(fetcher)
+    requests = stub.requests
+    assert requests == 3
+
+    # Fresh: served from memory without touching the endpoints
+    for _ in range(5):
+        fetcher.snapshot()
+    assert not fetcher.refreshing
+    assert stub.requests == requests
+
+    # Stale: the next snapshot starts exactly one background refresh
+    time.sleep(0.6)
+    fetcher.snapshot()
+    fetcher.snapshot()
+    wait_for_refresh(fetcher)
+    assert stub.requests == 2 * requests